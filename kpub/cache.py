@@ -0,0 +1,226 @@
+"""Caches the results of database queries and ADS requests.
+
+`ResultCache` holds the results of the analysis methods of `PublicationDB`.
+Results are keyed on the method, its arguments and the version of the
+database content (see `PublicationDB.version`), so a cached result is never
+stale: any change to the publications yields a new key, while outdated
+entries are eventually evicted.
+
+`ResponseCache` holds the responses of the ADS API, which do go stale,
+hence they expire after a configurable time.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import copy
+import json
+import time
+import zlib
+import pickle
+import hashlib
+import sqlite3 as sql
+import functools
+import threading
+import collections
+
+from . import __version__
+
+# How many results should be kept by default?
+DEFAULT_MAXSIZE = 128
+# How long (in seconds) are ADS responses reused by default?
+DEFAULT_TTL = 24 * 3600
+# How many bytes of (compressed) ADS responses are kept by default?
+DEFAULT_MAX_BYTES = 200 * 1024 ** 2
+
+
+class ResultCache(object):
+    """Least-recently-used cache of results, optionally stored on disk.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of results kept in memory, and on disk.
+
+    filename : str, optional
+        Path of an SQLite file in which the results are also stored,
+        so that they can be reused by later processes.
+    """
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, filename=None):
+        self.maxsize = maxsize
+        self.filename = filename
+        self.hits, self.misses = 0, 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._con = None
+        if filename is not None:
+            self._con = sql.connect(filename, check_same_thread=False)
+            self._con.execute("CREATE TABLE IF NOT EXISTS results("
+                              "key TEXT PRIMARY KEY, value BLOB, used REAL);")
+
+    def get(self, key):
+        """Returns a `(found, value)` tuple; the value is a private copy."""
+        with self._lock:
+            if key in self._entries:
+                value = self._entries.pop(key)
+                self._entries[key] = value  # mark as most recently used
+            elif self._con is not None:
+                with self._con:
+                    row = self._con.execute("SELECT value FROM results "
+                                            "WHERE key = ?;", [key]).fetchone()
+                    if row is None:
+                        self.misses += 1
+                        return False, None
+                    self._con.execute("UPDATE results SET used = ? "
+                                      "WHERE key = ?;", [time.time(), key])
+                value = pickle.loads(bytes(row[0]))
+                self._remember(key, value)
+            else:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+        return True, copy.deepcopy(value)
+
+    def set(self, key, value):
+        """Stores a copy of a result."""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value)
+            if self._con is not None:
+                with self._con:
+                    self._con.execute("INSERT OR REPLACE INTO results "
+                                      "(key, value, used) VALUES (?, ?, ?);",
+                                      [key, sql.Binary(pickle.dumps(value, 2)),
+                                       time.time()])
+                    self._con.execute("DELETE FROM results WHERE key NOT IN "
+                                      "(SELECT key FROM results "
+                                      "ORDER BY used DESC LIMIT ?);",
+                                      [self.maxsize])
+
+    def _remember(self, key, value):
+        """Adds a result to the in-memory entries, evicting the oldest."""
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all the results, including those stored on disk."""
+        with self._lock:
+            self._entries.clear()
+            if self._con is not None:
+                with self._con:
+                    self._con.execute("DELETE FROM results;")
+
+    def close(self):
+        """Closes the on-disk store, if any."""
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+
+class ResponseCache(object):
+    """Stores ADS API responses in an SQLite file.
+
+    Responses are addressed by a hash of the request, i.e. of the query,
+    fields, number of rows and offset, and are stored compressed.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the SQLite file.
+
+    ttl : float
+        Seconds after which a response expires.
+
+    max_bytes : int
+        Maximum total size of the stored responses; the least recently
+        used ones are evicted first.
+
+    refresh : bool
+        If `True`, the stored responses are ignored, but new responses
+        are still stored, i.e. the cache is refreshed.
+    """
+    def __init__(self, filename, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES,
+                 refresh=False):
+        self.filename = filename
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._con = sql.connect(filename, check_same_thread=False)
+        with self._con:
+            self._con.execute("CREATE TABLE IF NOT EXISTS responses("
+                              "key TEXT PRIMARY KEY, value BLOB, "
+                              "size INTEGER, created REAL, used REAL);")
+
+    @staticmethod
+    def key(path, params):
+        """Returns the address of a request."""
+        request = json.dumps([path, params], sort_keys=True)
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, path, params):
+        """Returns the stored response to a request, or `None`."""
+        if self.refresh:
+            return None
+        key = self.key(path, params)
+        now = time.time()
+        with self._lock, self._con:
+            row = self._con.execute("SELECT value FROM responses "
+                                    "WHERE key = ? AND created > ?;",
+                                    [key, now - self.ttl]).fetchone()
+            if row is None:
+                return None
+            self._con.execute("UPDATE responses SET used = ? WHERE key = ?;",
+                              [now, key])
+        return json.loads(zlib.decompress(bytes(row[0])).decode("utf-8"))
+
+    def set(self, path, params, response):
+        """Stores the response to a request."""
+        value = zlib.compress(json.dumps(response).encode("utf-8"))
+        now = time.time()
+        with self._lock, self._con:
+            self._con.execute("INSERT OR REPLACE INTO responses "
+                              "(key, value, size, created, used) "
+                              "VALUES (?, ?, ?, ?, ?);",
+                              [self.key(path, params), sql.Binary(value),
+                               len(value), now, now])
+            self._con.execute("DELETE FROM responses WHERE created <= ?;",
+                              [now - self.ttl])
+            # Evict the least recently used responses beyond the size cap
+            self._con.execute("DELETE FROM responses WHERE key IN ("
+                              "SELECT key FROM (SELECT key, SUM(size) OVER "
+                              "(ORDER BY used DESC, key) AS total "
+                              "FROM responses) WHERE total > ?);",
+                              [self.max_bytes])
+
+    def clear(self):
+        """Removes all the stored responses."""
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM responses;")
+
+    def close(self):
+        """Closes the SQLite file."""
+        self._con.close()
+
+
+def cached(method):
+    """Decorates a `PublicationDB` method to cache its results.
+
+    The database's `result_cache` attribute is used, if it is not `None`.
+    The results found in the cache are passed through the database's
+    `_from_cache` method, which returns them ready for use.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self.result_cache
+        if cache is None:
+            return method(self, *args, **kwargs)
+        key = repr((__version__, self.version, method.__name__,
+                    args, sorted(kwargs.items())))
+        found, value = cache.get(key)
+        if found:
+            return self._from_cache(value)
+        value = method(self, *args, **kwargs)
+        cache.set(key, value)
+        return value
+    return wrapper
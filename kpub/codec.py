@@ -0,0 +1,87 @@
+"""Encodes the ADS metadata stored in the `metrics` column of the database.
+
+The codec used for a row is recorded in its `codec` column, so that a
+database may contain a mix of encodings.  A NULL codec denotes plain JSON,
+which is how all rows were stored before codecs were introduced.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Which codec should be used for new rows by default?
+DEFAULT_CODEC = "json"
+
+
+def _zlib_encode(text):
+    return zlib.compress(text.encode("utf-8"), 9)
+
+
+def _zlib_decode(data):
+    return zlib.decompress(data).decode("utf-8")
+
+
+def _zstd_encode(text):
+    return zstandard.ZstdCompressor(level=19).compress(text.encode("utf-8"))
+
+
+def _zstd_decode(data):
+    return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+
+
+# Maps codec names onto (encode, decode) functions which convert JSON text
+# to and from the stored value.
+CODECS = {"json": (lambda text: text, lambda data: data),
+          "zlib": (_zlib_encode, _zlib_decode)}
+if zstandard is not None:
+    CODECS["zstd"] = (_zstd_encode, _zstd_decode)
+
+
+def encode(metadata, codec=DEFAULT_CODEC):
+    """Returns the value to store in the `metrics` column.
+
+    Parameters
+    ----------
+    metadata : dict
+        Raw ADS metadata of an article.
+
+    codec : str
+        One of the keys of `CODECS`.
+    """
+    if codec == "json":
+        return json.dumps(metadata)
+    # Compact separators, because whitespace is redundant once compressed
+    return CODECS[codec][0](json.dumps(metadata, separators=(",", ":")))
+
+
+def to_json(data, codec=None):
+    """Returns the JSON text of a stored `metrics` value."""
+    if codec is None:
+        return data
+    try:
+        return CODECS[codec][1](data)
+    except KeyError:
+        raise ValueError("Unknown metadata codec '{}'; is the optional "
+                         "dependency installed?".format(codec))
+
+
+def decode(data, codec=None):
+    """Returns the metadata dictionary of a stored `metrics` value."""
+    return json.loads(to_json(data, codec))
+
+
+def register(con):
+    """Registers the `kpub_json(metrics, codec)` SQL function on a connection.
+
+    The function returns the JSON text of a stored `metrics` value,
+    so that SQLite's JSON functions can be applied to encoded rows.
+    """
+    try:
+        con.create_function("kpub_json", 2, to_json, deterministic=True)
+    except (TypeError, NotImplementedError):  # Python < 3.8 or SQLite < 3.8.3
+        con.create_function("kpub_json", 2, to_json)
@@ -0,0 +1,136 @@
+"""Manages the SQLite connections used by `PublicationDB`."""
+from __future__ import print_function, division, unicode_literals
+
+import threading
+import contextlib
+import sqlite3 as sql
+
+from . import codec
+
+try:
+    from urllib.parse import quote  # Python 3
+except ImportError:
+    from urllib import quote  # Python 2
+
+# How long (in milliseconds) should a connection wait for a lock?
+DEFAULT_BUSY_TIMEOUT = 5000
+
+
+class ConnectionManager(object):
+    """Hands out the connections to a publication database file.
+
+    By default, all reads and writes go through the single `writer`
+    connection, which mimics a plain `sqlite3.connect`.  If `wal` is `True`,
+    the database is switched to write-ahead logging and every thread reads
+    through its own read-only connection, taken from a pool, so that readers
+    are not blocked by a long write transaction and vice versa.  Writes are
+    always serialized through the `transaction` context manager.
+
+    Note that SQLite stores the WAL journal mode in the database file,
+    i.e. it persists for all later connections.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the SQLite database file.
+
+    wal : bool
+        Enable write-ahead logging and the pool of reader connections.
+
+    busy_timeout : int
+        Milliseconds a connection waits for a lock before raising an error.
+
+    cache_size : int, optional
+        Value of SQLite's `cache_size` pragma for every connection,
+        in pages if positive or in KiB if negative.
+    """
+    def __init__(self, filename, wal=False,
+                 busy_timeout=DEFAULT_BUSY_TIMEOUT, cache_size=None):
+        self.filename = filename
+        self.wal = wal
+        self.busy_timeout = busy_timeout
+        self.cache_size = cache_size
+        self.writer = self._connect()
+        if wal:
+            self.writer.execute("PRAGMA journal_mode = WAL;")
+        self._write_lock = threading.RLock()
+        self._pool_lock = threading.Lock()
+        self._idle = []  # reader connections not used by any thread
+        self._readers = []  # all reader connections, for `close`
+        self._local = threading.local()
+
+    def _connect(self, readonly=False):
+        """Opens a new connection configured with the manager's settings."""
+        if readonly:
+            uri = "file:{}?mode=ro".format(quote(self.filename))
+            con = sql.connect(uri, uri=True, check_same_thread=False)
+        else:
+            con = sql.connect(self.filename, check_same_thread=False)
+        codec.register(con)
+        con.execute("PRAGMA busy_timeout = {:d};".format(self.busy_timeout))
+        if self.cache_size is not None:
+            con.execute("PRAGMA cache_size = {:d};".format(self.cache_size))
+        return con
+
+    @property
+    def pooled(self):
+        """Do reads go through a pool of per-thread connections?"""
+        return self.wal and self.filename != ":memory:"
+
+    @property
+    def reader(self):
+        """Returns the connection the calling thread should read through.
+
+        The connection is returned to the pool when the thread exits.
+        """
+        if not self.pooled:
+            return self.writer
+        lease = getattr(self._local, "lease", None)
+        if lease is None:
+            with self._pool_lock:
+                if self._idle:
+                    con = self._idle.pop()
+                else:
+                    con = self._connect(readonly=True)
+                    self._readers.append(con)
+            lease = _Lease(con, self._release)
+            self._local.lease = lease
+        return lease.con
+
+    def _release(self, con):
+        """Puts a reader connection back into the pool."""
+        with self._pool_lock:
+            if con in self._readers:
+                self._idle.append(con)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Context manager which serializes a write transaction.
+
+        The transaction is committed on exit, or rolled back on error.
+        """
+        with self._write_lock:
+            with self.writer:
+                yield self.writer
+
+    def close(self):
+        """Closes all the connections."""
+        with self._pool_lock:
+            for con in self._readers:
+                con.close()
+            self._readers, self._idle = [], []
+        self.writer.close()
+
+
+class _Lease(object):
+    """Holds a pooled connection on behalf of a thread.
+
+    The lease is stored in thread-local storage, so it is garbage collected
+    when the thread exits, at which point the connection is released.
+    """
+    def __init__(self, con, release):
+        self.con = con
+        self._release = release
+
+    def __del__(self):
+        self._release(self.con)
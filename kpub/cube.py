@@ -0,0 +1,135 @@
+"""Aggregates publication metrics over all combinations of dimensions.
+
+A `MetricsCube` holds the metrics of every cell of every roll-up of a set of
+dimensions, e.g. for the dimensions (year, mission) it holds the metrics per
+year and mission, per year, per mission, and overall.  It is created by
+`PublicationDB.get_metrics_cube`.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import itertools
+import collections
+
+import numpy as np
+
+# Metrics which are summed when cells are rolled up
+SUMMED_METRICS = ("publication_count", "refereed_count", "phd_count",
+                  "citation_count")
+# Metrics which count distinct authors, i.e. cannot simply be summed
+DISTINCT_METRICS = ("author_count", "first_author_count")
+METRICS = SUMMED_METRICS + DISTINCT_METRICS
+
+
+class MetricsCube(object):
+    """Publication metrics for every cell of every roll-up of some dimensions.
+
+    Parameters
+    ----------
+    dimensions : list of str
+        Names of the dimensions, e.g. ['year', 'mission'].
+
+    cells : iterable of tuples
+        One tuple per combination of dimension values present in the data,
+        holding the values followed by the `SUMMED_METRICS`.
+
+    authors : iterable of tuples
+        One tuple per distinct author of every combination of dimension
+        values, holding the values followed by the author's id and whether
+        or not they are the first author.
+    """
+    # Value shown by `rows` for dimensions which are rolled up
+    ALL = "all"
+
+    def __init__(self, dimensions, cells, authors):
+        self.dimensions = tuple(dimensions)
+        self._cells = {}
+        subsets = [subset
+                   for size in range(len(self.dimensions) + 1)
+                   for subset in itertools.combinations(range(len(self.dimensions)), size)]
+        ndim = len(self.dimensions)
+        for row in cells:
+            for subset in subsets:
+                totals = self._cell(tuple(row[idx] for idx in subset), subset)
+                for name, value in zip(SUMMED_METRICS, row[ndim:]):
+                    totals[name] += value
+        self._count_authors(subsets, list(authors))
+
+    def _cell(self, values, subset):
+        """Returns the (mutable) metrics of a cell, creating it if needed."""
+        key = tuple(zip([self.dimensions[idx] for idx in subset], values))
+        if key not in self._cells:
+            self._cells[key] = dict.fromkeys(METRICS, 0)
+        return self._cells[key]
+
+    def _count_authors(self, subsets, authors):
+        """Counts the distinct (first) authors of every cell.
+
+        Every combination of dimension values is encoded as an integer,
+        so that the distinct (cell, author) pairs of each roll-up can be
+        counted with `numpy.unique` rather than with Python sets.
+        """
+        if not authors:
+            return
+        ndim = len(self.dimensions)
+        columns = list(zip(*authors))
+        levels, codes = [], []
+        for column in columns[:ndim]:
+            index = {}
+            codes.append(np.array([index.setdefault(value, len(index))
+                                   for value in column], dtype=np.int64))
+            levels.append(sorted(index, key=index.get))
+        author_ids = np.array(columns[ndim], dtype=np.int64)
+        is_first = np.array(columns[ndim + 1], dtype=bool)
+        radix = author_ids.max() + 1
+        for subset in subsets:
+            cells = np.zeros(len(authors), dtype=np.int64)
+            for idx in subset:
+                cells = cells * len(levels[idx]) + codes[idx]
+            for name, mask in [("author_count", slice(None)),
+                               ("first_author_count", is_first)]:
+                pairs = np.unique(cells[mask] * radix + author_ids[mask])
+                numbers, counts = np.unique(pairs // radix, return_counts=True)
+                for number, count in zip(numbers.tolist(), counts.tolist()):
+                    values = []
+                    for idx in reversed(subset):
+                        number, code = divmod(number, len(levels[idx]))
+                        values.append(levels[idx][code])
+                    self._cell(tuple(reversed(values)), subset)[name] = count
+
+    def get(self, **filters):
+        """Returns the metrics of one cell as a dictionary.
+
+        The cell is selected by giving the value of some of the dimensions,
+        the other dimensions are rolled up, e.g. `cube.get(mission='k2')`
+        returns the metrics of all K2 publications.
+        """
+        for dimension in filters:
+            if dimension not in self.dimensions:
+                raise ValueError("'{}' is not a dimension of the cube, "
+                                 "choose from {}.".format(
+                                     dimension, ", ".join(self.dimensions)))
+        key = tuple((dimension, filters[dimension])
+                    for dimension in self.dimensions if dimension in filters)
+        return dict(self._cells.get(key, dict.fromkeys(METRICS, 0)))
+
+    def values(self, dimension):
+        """Returns the sorted list of values a dimension takes in the data."""
+        values = [key[0][1] for key in self._cells
+                  if len(key) == 1 and key[0][0] == dimension]
+        return sorted(values, key=lambda value: (value is None, value))
+
+    def rows(self):
+        """Returns the cells as a tidy list of dictionaries.
+
+        Every row holds the value of each dimension, or `ALL` if the
+        dimension is rolled up, followed by the metrics.
+        """
+        rows = []
+        for key in sorted(self._cells, key=lambda key: (len(key), repr(key))):
+            values = dict(key)
+            row = collections.OrderedDict(
+                (dimension, values.get(dimension, self.ALL))
+                for dimension in self.dimensions)
+            row.update((name, self._cells[key][name]) for name in METRICS)
+            rows.append(row)
+        return rows
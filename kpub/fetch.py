@@ -0,0 +1,343 @@
+"""Fetches article metadata from the ADS search API.
+
+`ADSClient` sends the requests of a command through a shared HTTP session
+and a bounded pool of threads.  Requests are throttled by a token bucket
+which follows the rate limit reported by ADS in the response headers,
+and failed requests are retried with exponential backoff and jitter.
+
+The API URL can be changed using the `KPUB_ADS_API_URL` environment
+variable, e.g. to benchmark against a local fake server.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import os
+import time
+import random
+import threading
+import itertools
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from astropy import log
+
+try:
+    from ads.base import BaseQuery
+    from ads.search import Article
+except ImportError:
+    BaseQuery, Article = None, None
+
+from . import __version__
+
+# Where is the ADS API?
+DEFAULT_API_URL = os.environ.get("KPUB_ADS_API_URL",
+                                 "https://api.adsabs.harvard.edu/v1")
+# Number of concurrent requests
+DEFAULT_WORKERS = 4
+# Maximum number of requests per second
+DEFAULT_RATE = 5.
+# Number of results per request (the maximum allowed by ADS)
+DEFAULT_ROWS = 2000
+# Number of pages requested ahead of the one being consumed by `iter_search`
+DEFAULT_PREFETCH = 1
+# Number of attempts for a request which fails temporarily
+DEFAULT_ATTEMPTS = 5
+# Base delay (in seconds) of the exponential backoff
+DEFAULT_BACKOFF = 1.
+# Longest wait (in seconds) for the rate limit to reset before giving up
+MAX_RATE_LIMIT_WAIT = 120.
+
+
+class ADSError(Exception):
+    """Raised if the ADS API returns an error."""
+    pass
+
+
+class TokenBucket(object):
+    """Throttles requests to a steady rate and to the ADS quota.
+
+    Tokens are added at `rate` per second, up to `capacity`, and every
+    request takes one.  In addition, the number of requests remaining
+    in the ADS quota is tracked using the `X-RateLimit-*` response headers:
+    once it is exhausted, requests wait until the quota is reset.
+
+    Parameters
+    ----------
+    rate : float
+        Maximum sustained number of requests per second.
+
+    capacity : float
+        Maximum number of requests in a burst.
+    """
+    def __init__(self, rate=DEFAULT_RATE, capacity=None):
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.remaining = None  # requests left in the ADS quota
+        self.reset = None  # time at which the quota is restored
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens may go negative: they are then reserved by waiting
+            self._tokens -= 1
+            wait = max(0., -self._tokens / self.rate)
+            if self.remaining is not None:
+                if self.remaining <= 0 and self.reset > now:
+                    wait = max(wait, self.reset - now)
+                else:
+                    self.remaining -= 1
+        if wait > MAX_RATE_LIMIT_WAIT:
+            raise ADSError("The ADS rate limit is exhausted until {}.".format(
+                           time.ctime(self.reset)))
+        if wait > 0:
+            time.sleep(wait)
+
+    def update(self, headers):
+        """Synchronizes the quota with the headers of an ADS response."""
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset = float(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            self.remaining, self.reset = remaining, reset
+
+
+class ADSClient(object):
+    """Sends search queries to the ADS API.
+
+    Parameters
+    ----------
+    token : str, optional
+        ADS API token.  Defaults to the token configured for the `ads`
+        package, e.g. in `~/.ads/dev_key`.
+
+    api_url : str
+        Base URL of the ADS API.
+
+    workers : int
+        Maximum number of concurrent requests.
+
+    rate : float
+        Maximum number of requests per second.
+
+    attempts : int
+        Number of attempts for requests failing with a network error,
+        a server error, or because of the rate limit.
+
+    backoff : float
+        Base delay in seconds between attempts, which doubles after every
+        attempt and is randomized ("full jitter").
+
+    timeout : float
+        Seconds to wait for a response.
+
+    response_cache : `kpub.cache.ResponseCache`, optional
+        Cache used to avoid repeating requests.
+    """
+    def __init__(self, token=None, api_url=DEFAULT_API_URL,
+                 workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+                 attempts=DEFAULT_ATTEMPTS, backoff=DEFAULT_BACKOFF,
+                 timeout=60, response_cache=None):
+        if token is None and BaseQuery is not None:
+            token = BaseQuery().token
+        self.api_url = api_url.rstrip("/")
+        self.attempts = attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.response_cache = response_cache
+        self.limiter = TokenBucket(rate)
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": "Bearer {}".format(token),
+            "User-Agent": "kpub/{}".format(__version__)})
+        # Allow one reusable connection per worker
+        adapter = HTTPAdapter(pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Stops the worker threads and closes the connections."""
+        self._executor.shutdown()
+        self.session.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
+
+    def _get(self, path, params):
+        """Returns the decoded JSON response of a GET request."""
+        if self.response_cache is not None:
+            response = self.response_cache.get(path, params)
+            if response is not None:
+                return response
+        response = self._request(path, params)
+        if self.response_cache is not None:
+            self.response_cache.set(path, params, response)
+        return response
+
+    def _request(self, path, params):
+        """Sends a GET request, retrying after temporary failures."""
+        url = "{}/{}".format(self.api_url, path)
+        for attempt in range(self.attempts):
+            self.limiter.acquire()
+            try:
+                response = self.session.get(url, params=params,
+                                            timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                self.limiter.update(response.headers)
+                if response.status_code == 200:
+                    return response.json()
+                error = ADSError("ADS returned HTTP {}: {}".format(
+                                 response.status_code, response.text[:200]))
+                # Do not retry requests which are invalid
+                if response.status_code != 429 and response.status_code < 500:
+                    raise error
+            if attempt + 1 < self.attempts:
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                log.debug("Retrying in {:.1f}s: {}".format(delay, error))
+                time.sleep(delay)
+        raise ADSError("Giving up after {} attempts: {}".format(
+                       self.attempts, error))
+
+    def search(self, q, fl=("bibcode",), rows=DEFAULT_ROWS, start=0,
+               sort="date desc, bibcode desc"):
+        """Returns one page of results of a search query.
+
+        Returns
+        -------
+        articles, num_found : list of `ads.Article`, int
+            The articles on the page, and the total number of results.
+        """
+        params = {"q": q, "fl": ",".join(fl), "rows": rows,
+                  "start": start, "sort": sort}
+        response = self._get("search/query", params)["response"]
+        return [Article(**doc) for doc in response["docs"]], response["numFound"]
+
+    def search_many(self, queries, fl=("bibcode",), rows=DEFAULT_ROWS,
+                    skip_errors=False):
+        """Yields all the results of several search queries.
+
+        The first page of every query is requested concurrently, followed
+        by all the remaining pages.
+
+        Parameters
+        ----------
+        queries : list of str
+            ADS search queries.
+
+        fl : list of str
+            Fields to retrieve.
+
+        rows : int
+            Number of results per request.
+
+        skip_errors : bool
+            If `True`, a query which fails is logged and yields `None`,
+            rather than raising an `ADSError`.
+
+        Yields
+        ------
+        articles : list of `ads.Article`
+            All the results of each query, in the order of `queries`.
+        """
+        firsts = [self._executor.submit(self.search, q, fl, rows)
+                  for q in queries]
+        pages = []
+        for q, first in zip(queries, firsts):
+            try:
+                articles, num_found = first.result()
+            except ADSError:
+                if not skip_errors:
+                    raise
+                log.error("Query failed: {}".format(q))
+                articles, num_found = None, 0
+            pages.append((q, articles,
+                          [self._executor.submit(self.search, q, fl, rows, start)
+                           for start in range(rows, num_found, rows)]))
+        for q, articles, futures in pages:
+            try:
+                for future in futures:
+                    articles.extend(future.result()[0])
+            except ADSError:
+                if not skip_errors:
+                    raise
+                log.error("Query failed: {}".format(q))
+                articles = None
+            yield articles
+
+    def search_all(self, q, fl=("bibcode",), rows=DEFAULT_ROWS):
+        """Returns all the results of a search query."""
+        return next(self.search_many([q], fl=fl, rows=rows))
+
+    def iter_search(self, q, fl=("bibcode",), rows=DEFAULT_ROWS,
+                    prefetch=DEFAULT_PREFETCH):
+        """Returns the results of a search query as a lazy stream.
+
+        The first page is requested right away, and the next `prefetch`
+        pages are requested in the background while a page is consumed,
+        so that the first article is available after a single request.
+
+        Returns
+        -------
+        results : `SearchResults`
+        """
+        return SearchResults(self, q, fl, rows, prefetch)
+
+
+class SearchResults(object):
+    """Iterates over the articles matching a query, page by page.
+
+    Created by `ADSClient.iter_search`.  Only the pages which are being
+    consumed or prefetched are held in memory.
+    """
+    def __init__(self, client, q, fl, rows, prefetch):
+        self.client = client
+        self.q = q
+        self.fl = fl
+        self.rows = rows
+        self.prefetch = prefetch
+        self._first = self._submit(0)
+
+    def _submit(self, start):
+        return self.client._executor.submit(self.client.search, self.q,
+                                            self.fl, self.rows, start)
+
+    @property
+    def num_found(self):
+        """Total number of results, known once the first page arrived."""
+        return self._first.result()[1]
+
+    def __iter__(self):
+        articles, num_found = self._first.result()
+        starts = iter(range(self.rows, num_found, self.rows))
+        pending = collections.deque(self._submit(start) for start
+                                    in itertools.islice(starts, self.prefetch))
+        try:
+            while True:
+                for article in articles:
+                    yield article
+                if not pending:
+                    return
+                articles = pending.popleft().result()[0]
+                for start in itertools.islice(starts, 1):
+                    pending.append(self._submit(start))
+        finally:
+            # The consumer may stop early, e.g. if the user quits
+            for future in pending:
+                future.cancel()
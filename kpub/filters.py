@@ -0,0 +1,197 @@
+"""Rules deciding which ADS candidates are proposed for review.
+
+`PublicationDB.update` and `PublicationDB.harvest` find candidates with
+broad ADS queries, e.g. any abstract mentioning "Kepler", and discard the
+irrelevant ones using a `RuleSet`.  The abstracts of a whole batch of
+candidates are joined into a single lower-case text, which is scanned once
+per phrase rule, and the set counts how many candidates each rule decided.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import re
+import bisect
+import collections
+
+# Terms which disqualify a candidate found by its title or abstract,
+# e.g. because it is about Johannes Kepler rather than the mission.
+DEFAULT_EXCLUDE = ['keplerian', 'johannes', 'k<sub>2</sub>',
+                   "kepler equation", "kepler's equation", "xmm-newton",
+                   "kepler's law", "kepler's third law", "kepler problem",
+                   "kepler crater", "kepler's supernova", "kepler's snr"]
+
+# Kinds of `Rule`, in the order in which they are applied
+KINDS = ("require", "include", "exclude", "property", "bibcode")
+
+# Separates the abstracts of a batch, which no phrase can match across
+SEPARATOR = "\x00"
+
+
+class Rule(object):
+    """A single triage rule.
+
+    Parameters
+    ----------
+    kind : str
+        One of:
+
+        * "require": reject candidates lacking the metadata field `pattern`;
+        * "exclude": reject candidates whose abstract contains the phrase
+          `pattern` (case-insensitive);
+        * "include": keep candidates whose abstract contains the phrase
+          `pattern`, even if it also contains an excluded phrase;
+        * "property": reject candidates with the ADS property `pattern`,
+          unless they were published in one of the `unless` publications;
+        * "bibcode": reject candidates whose bibcode matches the regular
+          expression `pattern`.
+
+    pattern : str
+        See `kind`.
+
+    name : str, optional
+        Name under which the hits of the rule are counted.
+        Defaults to the pattern.
+
+    unless : list of str, optional
+        See `kind`.
+    """
+    def __init__(self, kind, pattern, name=None, unless=()):
+        if kind not in KINDS:
+            raise ValueError("Unknown kind of rule '{}', choose from {}."
+                             .format(kind, ", ".join(KINDS)))
+        self.kind = kind
+        self.pattern = pattern
+        self.name = pattern if name is None else name
+        self.unless = [pub.lower() for pub in unless]
+
+    def __repr__(self):
+        return "<Rule {} {!r}>".format(self.kind, self.pattern)
+
+
+class RuleSet(object):
+    """Triages batches of candidates using a list of `Rule` objects.
+
+    A candidate is rejected by the first rule which applies to it, taking
+    the kinds of rules in the order of `KINDS`, and phrases in the order
+    in which they occur in the abstract.
+
+    Parameters
+    ----------
+    rules : list of `Rule`
+
+    Attributes
+    ----------
+    hits : `collections.Counter`
+        Number of candidates decided by each rule, by rule name, i.e.
+        rejected by an excluding rule or kept by an "include" rule.
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.hits = collections.Counter()
+        self._by_kind = dict((kind, [rule for rule in self.rules
+                                     if rule.kind == kind])
+                             for kind in KINDS)
+        self._phrases = [rule for rule in (self._by_kind["include"] +
+                                           self._by_kind["exclude"])
+                         if rule.pattern]
+        bibcodes = self._by_kind["bibcode"]
+        self._bibcode_regex = None
+        if bibcodes:
+            self._bibcode_regex = re.compile("|".join(
+                "(?P<r{}>{})".format(idx, rule.pattern)
+                for idx, rule in enumerate(bibcodes)))
+
+    def apply(self, articles):
+        """Triages a batch of candidates.
+
+        Parameters
+        ----------
+        articles : list of `ads.Article`
+
+        Returns
+        -------
+        rejections : list of `Rule` or None
+            For every article, the rule which rejected it, or `None`
+            if the article should be reviewed.
+        """
+        # The raw metadata is used, because missing attributes are lazy-loaded
+        metadata = [article._raw for article in articles]
+        phrases = self._match_phrases([meta.get("abstract") or ""
+                                       for meta in metadata])
+        rejections = []
+        for meta, matched in zip(metadata, phrases):
+            rule = self._triage(meta, matched)
+            if rule is not None:
+                self.hits[rule.name] += 1
+                if rule.kind == "include":
+                    rule = None
+            rejections.append(rule)
+        return rejections
+
+    def _match_phrases(self, texts):
+        """Returns the phrase rules matching each text, in order of occurrence.
+
+        The texts are joined, so that each phrase is searched for with one
+        `str.find` scan of the whole batch rather than one per text, and
+        the matches are mapped back to the texts by offset.
+        """
+        matches = [[] for _ in texts]
+        if not self._phrases:
+            return matches
+        # Lower-casing may change the length of a text, hence it comes first
+        texts = [text.lower() for text in texts]
+        offsets, position = [], 0
+        for text in texts:
+            offsets.append(position)
+            position += len(text) + len(SEPARATOR)
+        joined = SEPARATOR.join(texts)
+        found = []
+        for order, rule in enumerate(self._phrases):
+            phrase = rule.pattern.lower()
+            start = joined.find(phrase)
+            while start != -1:
+                found.append((start, order))
+                start = joined.find(phrase, start + 1)
+        for start, order in sorted(found):
+            idx = bisect.bisect_right(offsets, start) - 1
+            matches[idx].append(self._phrases[order])
+        return matches
+
+    def _triage(self, meta, phrases):
+        """Returns the rule deciding a candidate, or `None` if none applies."""
+        for rule in self._by_kind["require"]:
+            if meta.get(rule.pattern) is None:
+                return rule
+        for rule in phrases:
+            if rule.kind == "include":
+                return rule
+        if phrases:
+            return phrases[0]
+        properties = meta.get("property") or []
+        pub = meta.get("pub")
+        for rule in self._by_kind["property"]:
+            if (rule.pattern in properties and pub is not None
+                    and pub.lower() not in rule.unless):
+                return rule
+        if self._bibcode_regex is not None:
+            match = self._bibcode_regex.search(meta.get("bibcode") or "")
+            if match is not None:
+                return self._by_kind["bibcode"][int(match.lastgroup[1:])]
+        return None
+
+
+def default_rules(exclude=DEFAULT_EXCLUDE):
+    """Returns the rules applied to the candidates found by their abstract.
+
+    Parameters
+    ----------
+    exclude : list of str
+        Phrases which disqualify a candidate.
+    """
+    return RuleSet([Rule("require", "abstract", name="no abstract")] +
+                   [Rule("exclude", term) for term in exclude] +
+                   # Ignore all the unrefereed non-arxiv stuff
+                   [Rule("property", "NOT REFEREED", name="not refereed",
+                         unless=["arXiv e-prints"]),
+                    # Ignore proposals and cospar abstracts
+                    Rule("bibcode", r"\.prop\.", name="proposal"),
+                    Rule("bibcode", r"cosp\.\.", name="cospar abstract")])
@@ -6,13 +6,23 @@ from __future__ import print_function, division, unicode_literals
 import os
 import re
 import sys
+import csv
+import time
 import json
+import uuid
 import datetime
 import argparse
+import heapq
+import itertools
 import collections
 import sqlite3 as sql
 import numpy as np
 
+try:
+    from collections.abc import Mapping  # Python 3
+except ImportError:
+    from collections import Mapping  # Python 2
+
 try:
     import ads
 except Exception:
@@ -25,10 +35,67 @@ from astropy import log
 from astropy.utils.console import ProgressBar
 
 from . import plot, PACKAGEDIR, MISSIONS, SCIENCES
+from . import codec
+from .connection import ConnectionManager, DEFAULT_BUSY_TIMEOUT
+from .cube import MetricsCube
+from .cache import (ResultCache, ResponseCache, cached, DEFAULT_MAXSIZE,
+                    DEFAULT_TTL)
+from .fetch import ADSClient, ADSError
+from .filters import DEFAULT_EXCLUDE, default_rules
 
 # Where is the default location of the SQLite database?
 DEFAULT_DB = os.path.expanduser("~/.kpub.db")
 
+# Version of the database schema, stored in SQLite's `user_version` pragma.
+# Every version has a `PublicationDB._migrate_to_<version>` method.
+SCHEMA_VERSION = 8
+
+# Number of rows written per `executemany` call by the bulk methods.
+DEFAULT_CHUNKSIZE = 500
+
+# Number of rows fetched per query by the streaming iterators.
+DEFAULT_BATCHSIZE = 250
+
+# Metrics ranked by `top_k` using their indexed column
+RANKED_COLUMNS = ['citation_count', 'read_count']
+# Derived metrics ranked by `top_k`, mapped onto the columns they are
+# computed from and the function computing them
+RANKED_METRICS = {'citations_per_year':
+                  ('citation_count, date', lambda citations, date:
+                   _citations_per_year(citations, date))}
+
+# SQL expressions of the dimensions supported by `get_metrics_cube`
+CUBE_DIMENSIONS = collections.OrderedDict([
+    ('year', 'CAST(year AS INTEGER)'),
+    ('month', 'month'),
+    ('mission', 'mission'),
+    ('science', 'science'),
+    ('refereed', 'refereed'),
+    ('doctype', 'doctype')])
+
+# First month of each mission, used to align time series on mission start.
+MISSION_START = {'kepler': '2009-01', 'k2': '2014-01'}
+
+# How many bibcodes should be looked up per ADS query?
+DEFAULT_FETCH_BATCHSIZE = 100
+
+# How many candidates should `update` fetch per ADS request?  Pages are
+# prefetched during the review, so this mostly sets the wait for the first.
+DEFAULT_REVIEW_ROWS = 100
+
+# Review status of the candidates in the queue filled by `harvest`:
+# `pending` until reviewed, `accepted` once added as a Kepler/K2 paper,
+# `rejected` if classified as unrelated or disqualified by the exclusion
+# rules, and `skipped` if the reviewer did not decide.
+CANDIDATE_STATUSES = ('pending', 'accepted', 'rejected', 'skipped')
+
+# How often (in seconds) are the candidates of a month harvested again?
+DEFAULT_HARVEST_INTERVAL = 6 * 3600
+
+# How long (in days) are decided candidates kept in the review queue?
+# They prevent the candidates from being queued again by later harvests.
+DEFAULT_QUEUE_RETENTION = 180
+
 # Which metadata fields do we want to retrieve from the ADS API?
 # (basically everything apart from 'body' to reduce data volume)
 FIELDS = ['date', 'pub', 'id', 'volume', 'links_data', 'citation', 'doi',
@@ -41,6 +108,24 @@ FIELDS = ['date', 'pub', 'id', 'volume', 'links_data', 'citation', 'doi',
           'first_author', 'reader', 'read_count', 'indexstamp', 'issue', 'keyword_facet',
           'aff', 'facility', 'simbid']
 
+# Named subsets of `FIELDS` which the commands may fetch instead.
+# The `minimal` fields are needed to store and identify publications,
+# `site` adds what the publication lists and the search index use,
+# `analytics` adds what the spreadsheet and author statistics use.
+# Fields which were not fetched are backfilled when first accessed.
+FIELD_PROFILES = collections.OrderedDict()
+FIELD_PROFILES['minimal'] = ['id', 'bibcode', 'alternate_bibcode', 'identifier',
+                             'indexstamp', 'year', 'pubdate', 'title', 'author',
+                             'author_norm', 'first_author_norm', 'property',
+                             'doctype', 'pub', 'citation_count', 'read_count']
+FIELD_PROFILES['site'] = FIELD_PROFILES['minimal'] + [
+    'abstract', 'keyword_norm', 'doi', 'volume', 'issue', 'page', 'pub_raw']
+FIELD_PROFILES['analytics'] = FIELD_PROFILES['site'] + [
+    'aff', 'keyword', 'orcid', 'arxiv_class', 'database', 'facility',
+    'cite_read_boost', 'classic_factor']
+FIELD_PROFILES['full'] = FIELDS
+DEFAULT_PROFILE = 'site'
+
 
 class Highlight:
     """Defines colors for highlighting words in the terminal."""
@@ -53,6 +138,102 @@ class Highlight:
     END = '\033[0m'
 
 
+class Publication(Mapping):
+    """A publication row whose ADS metadata is decoded on first access.
+
+    Publications behave like the read-only metadata dictionaries returned
+    by earlier versions of kpub, i.e. `pub["title"]`, `pub.get("title")` and
+    `"{bibcode}".format(**pub)` all work, and also allow attribute access
+    (`pub.title`).  The keys which are stored as columns of the pubs table
+    (`COLUMNS`, e.g. `bibcode` or `citation_count`) are always read from
+    the columns, which are returned without decoding the metadata at all,
+    and which take precedence over the metadata if the two disagree, e.g.
+    if the table was updated by another client.
+
+    If the publication was added with a field profile which did not include
+    a key being accessed (see `FIELD_PROFILES`), the missing fields are
+    fetched from ADS and stored by the database the publication came from,
+    also if the publication was returned from the result cache.
+    """
+    COLUMNS = ("bibcode", "year", "mission", "science", "citation_count",
+               "read_count", "first_author_norm", "pubdate")
+    __slots__ = COLUMNS + ("_metrics", "_codec", "_metadata", "_fields", "_db")
+
+    def __init__(self, bibcode, year, mission, science, citation_count,
+                 read_count, first_author_norm, pubdate, metrics,
+                 codec_name=None, fields=None, db=None):
+        self.bibcode = bibcode
+        self.year = year
+        self.mission = mission
+        self.science = science
+        self.citation_count = citation_count
+        self.read_count = read_count
+        self.first_author_norm = first_author_norm
+        self.pubdate = pubdate
+        self._metrics = metrics
+        self._codec = codec_name
+        self._metadata = None
+        self._fields = fields
+        self._db = db
+
+    def __getstate__(self):
+        # The database is not copied along, e.g. into the result cache
+        return dict((name, getattr(self, name))
+                    for name in self.__slots__ if name != "_db")
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._db = None
+
+    @property
+    def metadata(self):
+        """The dictionary of ADS metadata, decoded on first access."""
+        if self._metadata is None:
+            self._metadata = codec.decode(self._metrics, self._codec)
+            self._metrics = None  # no longer needed
+        return self._metadata
+
+    def __getitem__(self, key):
+        if key in self.COLUMNS:
+            return getattr(self, key)
+        if (key not in self.metadata and key in FIELDS
+                and key not in _field_set(self._fields)
+                and self._db is not None):
+            self._db._backfill_publication(self, key)
+        return self.metadata[key]
+
+    def __setitem__(self, key, value):
+        if key in self.COLUMNS:
+            setattr(self, key, value)
+        self.metadata[key] = value
+
+    def __getattr__(self, name):
+        # Only called for the keys which are not stored as columns
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __iter__(self):
+        return iter(self.metadata)
+
+    def __len__(self):
+        return len(self.metadata)
+
+    def __repr__(self):
+        return "<Publication {}>".format(self.bibcode)
+
+
+# Columns to select from the pubs table to construct `Publication` objects
+# (the pubdate is stored in the `date` column)
+PUBLICATION_COLUMNS = ("bibcode, year, mission, science, citation_count, "
+                       "read_count, first_author_norm, date, metrics, codec, "
+                       "fields")
+
+
 class PublicationDB(object):
     """Class wrapping the SQLite database containing the publications.
 
@@ -60,10 +241,56 @@ class PublicationDB(object):
     ----------
     filename : str
         Path to the SQLite database file.
+
+    wal : bool
+        If `True`, switch the database to write-ahead logging and read
+        through a pool of per-thread connections, so that readers and the
+        (serialized) writer do not block each other.
+        See `kpub.connection.ConnectionManager`.
+
+    busy_timeout : int
+        Milliseconds to wait for a lock held by another connection.
+
+    cache_size : int, optional
+        SQLite page cache size, in pages if positive or in KiB if negative.
+
+    result_cache_size : int
+        Number of results of the analysis methods (`get_metrics`,
+        `get_most_cited`, etc) to cache, or 0 to disable the cache.
+        See `kpub.cache.ResultCache`.
+
+    result_cache_file : str, optional
+        SQLite file in which the cached results are also stored,
+        so that later processes can reuse them.
+
+    queue_file : str, optional
+        SQLite file holding the queue of candidates awaiting review (see
+        `harvest`), which is attached to the database as the `queue`
+        schema by the methods using the queue.  It is kept apart because
+        it is local working state, whereas the database is shared.
+        Defaults to the database filename followed by ".queue".
     """
-    def __init__(self, filename=DEFAULT_DB):
+    def __init__(self, filename=DEFAULT_DB, wal=False,
+                 busy_timeout=DEFAULT_BUSY_TIMEOUT, cache_size=None,
+                 result_cache_size=DEFAULT_MAXSIZE, result_cache_file=None,
+                 queue_file=None):
         self.filename = filename
-        self.con = sql.connect(filename)
+        if queue_file is None:
+            queue_file = (":memory:" if filename == ":memory:"
+                          else filename + ".queue")
+        self.queue_file = queue_file
+        self.result_cache = None
+        # (data_version, ids, bibcodes) behind `__contains__`, built lazily
+        self._members = None
+        # Profiles which could not be backfilled on access, see `Publication`
+        self._backfill_failed = set()
+        if result_cache_size > 0:
+            self.result_cache = ResultCache(result_cache_size, result_cache_file)
+        self.connections = ConnectionManager(filename, wal=wal,
+                                             busy_timeout=busy_timeout,
+                                             cache_size=cache_size)
+        # All writes go through this connection
+        self.con = self.connections.writer
         pubs_table_exists = self.con.execute(
                                 """
                                    SELECT COUNT(*) FROM sqlite_master
@@ -71,6 +298,23 @@ class PublicationDB(object):
                                 """).fetchone()[0]
         if not pubs_table_exists:
             self.create_table()
+        # Whether the full-text index can be used, see `search`
+        self.full_text = _has_fts5(self.con)
+        # `queue_file` is attached on first use, see `_attach_queue`
+        self._queue_attached = False
+        self.migrate()
+        self.full_text = self.full_text and self._has_table("pubs_fts")
+
+    @property
+    def reader(self):
+        """The connection the calling thread should read through."""
+        return self.connections.reader
+
+    def close(self):
+        """Closes all the connections to the database."""
+        self.connections.close()
+        if self.result_cache is not None:
+            self.result_cache.close()
 
     def create_table(self):
         self.con.execute("""CREATE TABLE pubs(
@@ -83,37 +327,478 @@ class PublicationDB(object):
                                 science,
                                 metrics)""")
 
-    def add(self, article, mission="kepler", science="exoplanets"):
+    def migrate(self):
+        """Upgrades the database to the latest schema version.
+
+        Each migration runs inside its own transaction, so an interrupted
+        upgrade leaves the database at the last completed version.
+        """
+        version = self.con.execute("PRAGMA user_version;").fetchone()[0]
+        for new_version in range(version + 1, SCHEMA_VERSION + 1):
+            log.debug("Migrating {} to schema version {}.".format(
+                      self.filename, new_version))
+            with self.connections.transaction():
+                self.con.execute("BEGIN;")
+                getattr(self, "_migrate_to_{}".format(new_version))()
+                self.con.execute("PRAGMA user_version = {:d};".format(new_version))
+
+    def _migrate_to_1(self):
+        """Promotes the frequently-used metadata fields to typed columns.
+
+        The table is rebuilt, so as to also declare the rowid, by which the
+        author and full-text indexes refer to the publications, as INTEGER
+        PRIMARY KEY: VACUUM may renumber the rowids otherwise.
+        """
+        self.con.execute("""CREATE TABLE pubs_new(
+                                rowid INTEGER PRIMARY KEY,
+                                id UNIQUE,
+                                bibcode UNIQUE,
+                                year,
+                                month,
+                                date,
+                                mission,
+                                science,
+                                metrics,
+                                citation_count INTEGER,
+                                read_count REAL,
+                                refereed INTEGER,
+                                doctype TEXT,
+                                first_author_norm TEXT)""")
+        # Fill the new columns from the metadata of existing rows
+        rows = self.con.execute("SELECT rowid, id, bibcode, year, month, "
+                                "date, mission, science, metrics "
+                                "FROM pubs;").fetchall()
+        self.con.executemany("INSERT INTO pubs_new VALUES (?, ?, ?, ?, ?, ?, "
+                             "?, ?, ?, ?, ?, ?, ?, ?);",
+                             [tuple(row) + _derived_columns(json.loads(row[-1]))
+                              for row in rows])
+        self.con.execute("DROP TABLE pubs;")
+        self.con.execute("ALTER TABLE pubs_new RENAME TO pubs;")
+        self.con.execute("CREATE INDEX pubs_mission_science_year "
+                         "ON pubs(mission, science, year);")
+        self.con.execute("CREATE INDEX pubs_date ON pubs(date);")
+        self.con.execute("CREATE INDEX pubs_citation_count "
+                         "ON pubs(citation_count);")
+        self.con.execute("CREATE INDEX pubs_read_count ON pubs(read_count);")
+        self.con.execute("CREATE INDEX pubs_first_author_norm "
+                         "ON pubs(first_author_norm);")
+
+    def _migrate_to_2(self):
+        """Adds the normalized author tables used by the author statistics."""
+        self.con.execute("""CREATE TABLE authors(
+                                id INTEGER PRIMARY KEY,
+                                name TEXT UNIQUE NOT NULL)""")
+        self.con.execute("""CREATE TABLE pub_authors(
+                                pub_rowid INTEGER NOT NULL,
+                                author_id INTEGER NOT NULL,
+                                position INTEGER NOT NULL,
+                                PRIMARY KEY (pub_rowid, position))""")
+        self.con.execute("CREATE INDEX pub_authors_author_id "
+                         "ON pub_authors(author_id, position);")
+        rows = self.con.execute("SELECT rowid, metrics FROM pubs;").fetchall()
+        self._index_authors((rowid, json.loads(metrics).get("author_norm"))
+                            for rowid, metrics in rows)
+
+    def _migrate_to_3(self):
+        """Adds a full-text index over titles, abstracts, keywords and authors.
+
+        The index is contentless, i.e. it does not store a second copy of
+        the text, and it is updated by the methods writing to the pubs table
+        (see `_index_text`) rather than by triggers, so that other clients,
+        e.g. the sqlite3 shell, can still write to the table.
+        """
+        if not self.full_text:
+            log.warning("SQLite was built without FTS5 support: "
+                        "full-text search will not be available.")
+            return
+        self.con.execute("CREATE VIRTUAL TABLE pubs_fts "
+                         "USING fts5(title, abstract, keyword_norm, author, "
+                         "content='');")
+        rows = self.con.execute("SELECT rowid, metrics FROM pubs;").fetchall()
+        self._index_text((rowid, json.loads(metrics)) for rowid, metrics in rows)
+
+    def _migrate_to_4(self):
+        """Adds the codec column and the table of database-wide settings."""
+        self.con.execute("ALTER TABLE pubs ADD COLUMN codec TEXT;")
+        self.con.execute("""CREATE TABLE meta(
+                                key TEXT PRIMARY KEY,
+                                value)""")
+
+    def _migrate_to_5(self):
+        """Indexes the sort order used by the streaming iterators."""
+        self.con.execute("DROP INDEX pubs_date;")
+        self.con.execute("CREATE INDEX pubs_date_bibcode ON pubs(date, bibcode);")
+
+    def _migrate_to_6(self):
+        """Adds a persistent counter which changes with every modification.
+
+        Together with a random database id, the counter identifies
+        the content of the database, e.g. to invalidate derived files.
+        """
+        self._set_meta("id", uuid.uuid4().hex)
+        self._set_meta("generation", 0)
+        for event in ["INSERT", "DELETE", "UPDATE"]:
+            self.con.execute("""CREATE TRIGGER pubs_generation_{}
+                                AFTER {} ON pubs
+                                BEGIN
+                                    UPDATE meta SET value = value + 1
+                                    WHERE key = 'generation';
+                                END""".format(event.lower(), event))
+
+    def _migrate_to_7(self):
+        """Adds the pub_counts summary table, maintained by triggers."""
+        self.con.execute("""CREATE TABLE pub_counts(
+                                year, month, mission,
+                                science TEXT NOT NULL,
+                                refereed INTEGER NOT NULL,
+                                count INTEGER NOT NULL,
+                                PRIMARY KEY (year, month, mission,
+                                             science, refereed))""")
+        self._create_count_triggers()
+        self._fill_counts()
+
+    def _migrate_to_8(self):
+        """Adds the column listing the ADS fields fetched for each row.
+
+        The column is NULL if all of `FIELDS` were fetched, as was the case
+        for the rows added by earlier versions.
+        """
+        self.con.execute("ALTER TABLE pubs ADD COLUMN fields TEXT;")
+
+    def _attach_queue(self):
+        """Attaches `queue_file` as the `queue` schema, unless it is already.
+
+        The file is only created, and written to, once the queue is used,
+        so that merely reading the database leaves no trace next to it.
+        The queue is only accessed through the writer connection.
+        """
+        with self.connections.transaction():
+            if not self._queue_attached:
+                self.con.execute("ATTACH DATABASE ? AS queue;",
+                                 [self.queue_file])
+                self._create_queue_tables()
+                self._queue_attached = True
+
+    def _create_queue_tables(self):
+        """Creates the tables of `queue_file`, unless they exist already."""
+        self.con.execute("""CREATE TABLE IF NOT EXISTS queue.candidates(
+                                bibcode TEXT PRIMARY KEY,
+                                month TEXT NOT NULL,
+                                source TEXT NOT NULL,
+                                position INTEGER NOT NULL,
+                                status TEXT NOT NULL DEFAULT 'pending'
+                                    CHECK (status IN ({})),
+                                metrics,
+                                codec TEXT,
+                                fields TEXT,
+                                harvested REAL,
+                                reviewed REAL)""".format(
+                             ", ".join("'{}'".format(status)
+                                       for status in CANDIDATE_STATUSES)))
+        self.con.execute("CREATE INDEX IF NOT EXISTS queue.candidates_status "
+                         "ON candidates(status, month, source, position);")
+        self.con.execute("CREATE TABLE IF NOT EXISTS queue.harvests("
+                         "month TEXT PRIMARY KEY, harvested REAL);")
+
+    def _create_count_triggers(self):
+        """Keeps pub_counts in sync with the pubs table.
+
+        NULL values cannot be part of a primary key conflict, so a missing
+        science is counted as '' and an unknown refereed status as -1.
+        """
+        increment = """INSERT INTO pub_counts
+                           (year, month, mission, science, refereed, count)
+                       VALUES (new.year, new.month, new.mission,
+                               IFNULL(new.science, ''),
+                               IFNULL(new.refereed, -1), 1)
+                       ON CONFLICT (year, month, mission, science, refereed)
+                       DO UPDATE SET count = count + 1;"""
+        decrement = """UPDATE pub_counts SET count = count - 1
+                       WHERE year IS old.year AND month IS old.month
+                       AND mission IS old.mission
+                       AND science = IFNULL(old.science, '')
+                       AND refereed = IFNULL(old.refereed, -1);
+                       DELETE FROM pub_counts WHERE count <= 0;"""
+        self.con.execute("""CREATE TRIGGER pubs_counts_insert
+                            AFTER INSERT ON pubs
+                            BEGIN {} END""".format(increment))
+        self.con.execute("""CREATE TRIGGER pubs_counts_delete
+                            AFTER DELETE ON pubs
+                            BEGIN {} END""".format(decrement))
+        self.con.execute("""CREATE TRIGGER pubs_counts_update
+                            AFTER UPDATE OF year, month, mission, science,
+                                            refereed ON pubs
+                            BEGIN {} {} END""".format(decrement, increment))
+
+    def _fill_counts(self):
+        """Recomputes the content of the pub_counts table from scratch."""
+        self.con.execute("DELETE FROM pub_counts;")
+        self.con.execute("INSERT INTO pub_counts "
+                         "(year, month, mission, science, refereed, count) "
+                         "SELECT year, month, mission, IFNULL(science, ''), "
+                         "IFNULL(refereed, -1), COUNT(*) FROM pubs "
+                         "GROUP BY 1, 2, 3, 4, 5;")
+
+    def rebuild_aggregates(self):
+        """Recomputes the trigger-maintained summary tables.
+
+        The triggers keep the tables current, so this is only needed to
+        repair a database which was modified with the triggers disabled.
+        """
+        with self.connections.transaction():
+            self._fill_counts()
+            self._bump_generation()
+
+    def _has_table(self, name):
+        """Returns `True` if the database contains the table `name`."""
+        return bool(self.con.execute("SELECT COUNT(*) FROM sqlite_master "
+                                     "WHERE type = 'table' AND name = ?;",
+                                     [name]).fetchone()[0])
+
+    def _get_meta(self, key, default=None):
+        """Returns a database-wide setting stored in the meta table."""
+        row = self.reader.execute("SELECT value FROM meta WHERE key = ?;",
+                                  [key]).fetchone()
+        return default if row is None else row[0]
+
+    def _set_meta(self, key, value):
+        """Stores a database-wide setting in the meta table."""
+        self.con.execute("INSERT OR REPLACE INTO meta (key, value) "
+                         "VALUES (?, ?);", [key, value])
+
+    def _harvested(self, month):
+        """Returns when the candidates of a month were last harvested."""
+        row = self.con.execute("SELECT harvested FROM queue.harvests "
+                               "WHERE month = ?;", [month]).fetchone()
+        return None if row is None else row[0]
+
+    def _set_harvested(self, month):
+        """Records that the candidates of a month were just harvested."""
+        self.con.execute("INSERT OR REPLACE INTO queue.harvests "
+                         "(month, harvested) VALUES (?, ?);",
+                         [month, time.time()])
+
+    @property
+    def codec(self):
+        """Name of the codec used to encode the metadata of new rows."""
+        return self._get_meta("codec", codec.DEFAULT_CODEC)
+
+    @property
+    def generation(self):
+        """Counter which is incremented by every change to the pubs table."""
+        return self._get_meta("generation", 0)
+
+    @property
+    def version(self):
+        """Identifies the content of the database, see `generation`.
+
+        Copies of the database which were changed separately, e.g. in two
+        clones of the git repository, may reach the same generation, so
+        the size and modification time of the file are included as well.
+        """
+        version = "{}-{}".format(self._get_meta("id"), self.generation)
+        if self.filename != ":memory:" and os.path.exists(self.filename):
+            stat = os.stat(self.filename)
+            version += "-{}-{}".format(stat.st_size, int(stat.st_mtime * 1e6))
+        return version
+
+    def _bump_generation(self):
+        """Marks the content as changed for the changes the triggers miss.
+
+        The triggers only see changes to the pubs table, whereas e.g.
+        `rebuild_aggregates` and `reindex` repair the derived tables,
+        on which cached results depend as well.
+        """
+        self.con.execute("UPDATE meta SET value = value + 1 "
+                         "WHERE key = 'generation';")
+
+    def _index_authors(self, rows):
+        """Links rows of the pubs table to their authors.
+
+        Parameters
+        ----------
+        rows : iterable of (rowid, author_norm) tuples
+            Where `author_norm` is the list of normalized author names,
+            in the order of the author list, or None.
+        """
+        names, links = [], []
+        for rowid, author_norm in rows:
+            for position, name in enumerate(author_norm or []):
+                names.append((name,))
+                links.append((rowid, position, name))
+        self.con.executemany("INSERT OR IGNORE INTO authors (name) VALUES (?);",
+                             names)
+        self.con.executemany("INSERT INTO pub_authors "
+                             "(pub_rowid, author_id, position) "
+                             "SELECT ?, id, ? FROM authors WHERE name = ?;",
+                             links)
+
+    def _index_text(self, rows, remove=False):
+        """Adds rows of the pubs table to the full-text index, or removes them.
+
+        The index is contentless, i.e. it does not store the text itself,
+        so a row is removed by passing the metadata it was indexed with.
+
+        Parameters
+        ----------
+        rows : iterable of (rowid, metadata) tuples
+            Where `metadata` is the raw ADS metadata of the row.
+
+        remove : bool
+            If `True`, remove the rows from the index instead.
+        """
+        if not self.full_text:
+            return
+        if remove:
+            query = ("INSERT INTO pubs_fts (pubs_fts, rowid, title, abstract, "
+                     "keyword_norm, author) VALUES ('delete', ?, ?, ?, ?, ?);")
+        else:
+            query = ("INSERT INTO pubs_fts (rowid, title, abstract, "
+                     "keyword_norm, author) VALUES (?, ?, ?, ?, ?);")
+        self.con.executemany(query, [(rowid,) + _fts_values(metadata)
+                                     for rowid, metadata in rows])
+
+    def _reindex_text(self, rows):
+        """Updates the full-text index of rows whose metadata changed.
+
+        Parameters
+        ----------
+        rows : iterable of (rowid, old_metadata, new_metadata) tuples
+        """
+        rows = [(rowid, old, new) for rowid, old, new in rows
+                if _fts_values(old) != _fts_values(new)]
+        self._index_text(((rowid, old) for rowid, old, _ in rows), remove=True)
+        self._index_text((rowid, new) for rowid, _, new in rows)
+
+    def add(self, article, mission="kepler", science="exoplanets", fields=None):
         """Adds a single article object to the database.
 
         Parameters
         ----------
         article : `ads.Article` object.
             An article object as returned by `ads.SearchQuery`.
+
+        fields : list of str, optional
+            See `add_many`.
         """
         log.debug('Ingesting {}'.format(article.bibcode))
-        # Also store the extra metadata in the json string
-        month = article.pubdate[0:7]
-        article._raw['mission'] = mission
-        article._raw['science'] = science
-        try:
-            cur = self.con.execute("INSERT INTO pubs "
-                                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                                   [article.id, article.bibcode,
-                                    article.year, month, article.pubdate,
-                                    mission, science,
-                                    json.dumps(article._raw)])
-            log.info('Inserted {} row(s).'.format(cur.rowcount))
-            self.con.commit()
-        except sql.IntegrityError:
+        outcome = self.add_many([(article, mission, science)],
+                                fields=fields)[0][1]
+        if outcome == "inserted":
+            log.info('Inserted 1 row(s).')
+        else:
             log.warning('{} was already ingested.'.format(article.bibcode))
 
-    def add_interactively(self, article, statusmsg=""):
+    def add_many(self, articles, mission="kepler", science="exoplanets",
+                 fields=None, chunksize=DEFAULT_CHUNKSIZE):
+        """Adds many article objects to the database in one transaction.
+
+        Parameters
+        ----------
+        articles : iterable
+            Either `ads.Article` objects, or (article, mission, science)
+            tuples if the classification differs between the articles.
+
+        mission, science : str
+            Classification of the articles which are not passed as tuples.
+
+        fields : list of str, optional
+            ADS fields which were requested for the articles, e.g. one of
+            the `FIELD_PROFILES`.  Defaults to all of `FIELDS`.
+
+        chunksize : int
+            Number of rows written per `executemany` call.
+
+        Returns
+        -------
+        outcomes : list of (bibcode, outcome) tuples
+            Where outcome is "inserted" or "duplicate", in input order.
+        """
+        outcomes, inserted = [], []
+        seen = set()  # ids and bibcodes inserted earlier in this call
+        codec_name = self.codec
+        fields = None if fields is None else _fields_value(set(fields))
+        with self.connections.transaction():
+            for chunk in _chunks(articles, chunksize):
+                items = []
+                for item in chunk:
+                    if isinstance(item, tuple):
+                        items.append(item)
+                    else:
+                        items.append((item, mission, science))
+                existing = self._existing_keys([art.id for art, _, _ in items],
+                                               [art.bibcode for art, _, _ in items])
+                rows, added = [], []
+                for article, art_mission, art_science in items:
+                    if (article.id in existing or article.bibcode in existing
+                            or article.id in seen or article.bibcode in seen):
+                        outcomes.append((article.bibcode, "duplicate"))
+                        continue
+                    seen.update([article.id, article.bibcode])
+                    # Also store the extra metadata in the json string
+                    article._raw['mission'] = art_mission
+                    article._raw['science'] = art_science
+                    rows.append([article.id, article.bibcode, article.year,
+                                 article.pubdate[0:7], article.pubdate,
+                                 art_mission, art_science,
+                                 codec.encode(article._raw, codec_name),
+                                 codec_name, fields] +
+                                list(_derived_columns(article._raw)))
+                    added.append((article.bibcode, article._raw))
+                    inserted.append(article)
+                    outcomes.append((article.bibcode, "inserted"))
+                self.con.executemany("INSERT INTO pubs (id, bibcode, year, "
+                                     "month, date, mission, science, metrics, "
+                                     "codec, fields, citation_count, "
+                                     "read_count, refereed, doctype, "
+                                     "first_author_norm) "
+                                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+                                     "?, ?, ?, ?, ?)", rows)
+                rowids = self._rowids([bibcode for bibcode, _ in added])
+                self._index_authors((rowids[bibcode],
+                                     metadata.get("author_norm"))
+                                    for bibcode, metadata in added)
+                self._index_text((rowids[bibcode], metadata)
+                                 for bibcode, metadata in added)
+        if self._members is not None:
+            _, ids, bibcodes = self._members
+            for article in inserted:
+                ids.add(article.id)
+                bibcodes.add(article.bibcode)
+                bibcodes.update(article._raw.get("alternate_bibcode") or [])
+        return outcomes
+
+    def _existing_keys(self, ids, bibcodes):
+        """Returns the subset of `ids` and `bibcodes` present in the db."""
+        existing = set()
+        for column, values in [("id", ids), ("bibcode", bibcodes)]:
+            if not values:
+                continue
+            cur = self.con.execute("SELECT {0} FROM pubs WHERE {0} IN ({1});"
+                                   .format(column, ", ".join("?" * len(values))),
+                                   values)
+            existing.update(row[0] for row in cur)
+        return existing
+
+    def _rowids(self, bibcodes):
+        """Returns a dictionary mapping bibcodes onto pubs table rowids."""
+        if not bibcodes:
+            return {}
+        cur = self.con.execute("SELECT bibcode, rowid FROM pubs "
+                               "WHERE bibcode IN ({});".format(
+                                   ", ".join("?" * len(bibcodes))),
+                               bibcodes)
+        return dict(cur.fetchall())
+
+    def add_interactively(self, article, statusmsg="", fields=None):
         """Adds an article by prompting the user for the classification.
 
         Parameters
         ----------
         article : `ads.Article` object
+
+        fields : list of str, optional
+            See `add_many`.
         """
         # Do not show an article that is already in the database
         if article in self:
@@ -121,6 +806,23 @@ class PublicationDB(object):
                      "-- skipping.".format(article.bibcode))
             return
 
+        classification = self.classify_interactively(article, statusmsg)
+        if classification is not None:
+            mission, science = classification
+            self.add(article, mission=mission, science=science, fields=fields)
+
+    def classify_interactively(self, article, statusmsg=""):
+        """Prompts the user for the mission and science of an article.
+
+        Parameters
+        ----------
+        article : `ads.Article` object
+
+        Returns
+        -------
+        classification : (mission, science) tuple
+            Or `None` if the user skipped the article.
+        """
         # Print paper information to stdout
         print(chr(27) + "[2J")  # Clear screen
         print(statusmsg)
@@ -137,7 +839,7 @@ class PublicationDB(object):
         elif prompt == "3":
             mission = "unrelated"
         else:
-            return
+            return None
         print(mission)
 
         # Now classify by science
@@ -151,18 +853,14 @@ class PublicationDB(object):
                 science = "astrophysics"
             print(science)
 
-        self.add(article, mission=mission, science=science)
+        return mission, science
 
     def add_by_bibcode(self, bibcode, interactive=False, **kwargs):
         if ads is None:
             log.error("This action requires the ADS key to be setup.")
             return
 
-        q = ads.SearchQuery(q="identifier:{}".format(bibcode), fl=FIELDS)
-        for article in q:
-            # Print useful warnings
-            if bibcode != article.bibcode:
-                log.warning("Requested {} but ADS API returned {}".format(bibcode, article.bibcode))
+        for article in _fetch_by_bibcode(bibcode):
             if interactive and ('NONARTICLE' in article.property):
                 # Note: data products are sometimes tagged as NONARTICLE
                 log.warning("{} is not an article.".format(article.bibcode))
@@ -176,14 +874,183 @@ class PublicationDB(object):
                     self.add(article, **kwargs)
 
     def delete_by_bibcode(self, bibcode):
-        cur = self.con.execute("DELETE FROM pubs WHERE bibcode = ?;", [bibcode])
-        log.info('Deleted {} row(s).'.format(cur.rowcount))
-        self.con.commit()
+        outcome = self.delete_many([bibcode])[0][1]
+        log.info('Deleted {} row(s).'.format(int(outcome == "deleted")))
+
+    def delete_many(self, bibcodes, chunksize=DEFAULT_CHUNKSIZE):
+        """Deletes many publications from the database in one transaction.
+
+        Parameters
+        ----------
+        bibcodes : iterable of str
+            ADS bibcodes of the publications to delete.
+
+        chunksize : int
+            Number of rows deleted per `executemany` call.
+
+        Returns
+        -------
+        outcomes : list of (bibcode, outcome) tuples
+            Where outcome is "deleted" or "missing", in input order.
+        """
+        outcomes = []
+        with self.connections.transaction():
+            for chunk in _chunks(bibcodes, chunksize):
+                rowids = self._rowids(chunk)
+                cur = self.con.execute("SELECT rowid, metrics, codec FROM pubs "
+                                       "WHERE rowid IN ({});".format(
+                                           ", ".join("?" * len(rowids))),
+                                       list(rowids.values()))
+                self._index_text([(rowid, codec.decode(metrics, codec_name))
+                                  for rowid, metrics, codec_name in cur],
+                                 remove=True)
+                self.con.executemany("DELETE FROM pub_authors "
+                                     "WHERE pub_rowid = ?;",
+                                     [(rowid,) for rowid in rowids.values()])
+                self.con.executemany("DELETE FROM pubs WHERE rowid = ?;",
+                                     [(rowid,) for rowid in rowids.values()])
+                for bibcode in chunk:
+                    if rowids.pop(bibcode, None) is None:
+                        outcomes.append((bibcode, "missing"))
+                    else:
+                        outcomes.append((bibcode, "deleted"))
+        # The alternate bibcodes of the deleted rows are unknown at this point
+        self._members = None
+        return outcomes
+
+    def reclassify_many(self, items, chunksize=DEFAULT_CHUNKSIZE):
+        """Changes the mission and science of many publications at once.
+
+        Parameters
+        ----------
+        items : iterable of (bibcode, mission, science) tuples
+            The new classification of each publication.
+
+        chunksize : int
+            Number of rows updated per `executemany` call.
+
+        Returns
+        -------
+        outcomes : list of (bibcode, outcome) tuples
+            Where outcome is "updated" or "missing", in input order.
+        """
+        outcomes = []
+        with self.connections.transaction():
+            for chunk in _chunks(items, chunksize):
+                bibcodes = [item[0] for item in chunk]
+                cur = self.con.execute("SELECT bibcode, metrics, codec FROM pubs "
+                                       "WHERE bibcode IN ({});".format(
+                                           ", ".join("?" * len(bibcodes))),
+                                       bibcodes)
+                metadata, codecs = {}, {}
+                for bibcode, metrics, codec_name in cur:
+                    metadata[bibcode] = codec.decode(metrics, codec_name)
+                    codecs[bibcode] = codec_name or "json"
+                rows = []
+                for bibcode, mission, science in chunk:
+                    if bibcode not in metadata:
+                        outcomes.append((bibcode, "missing"))
+                        continue
+                    metadata[bibcode]['mission'] = mission
+                    metadata[bibcode]['science'] = science
+                    rows.append((mission, science,
+                                 codec.encode(metadata[bibcode], codecs[bibcode]),
+                                 bibcode))
+                    outcomes.append((bibcode, "updated"))
+                self.con.executemany("UPDATE pubs SET mission = ?, science = ?, "
+                                     "metrics = ? WHERE bibcode = ?;", rows)
+        return outcomes
+
+    def compact(self, codec_name="zlib", vacuum=True,
+                chunksize=DEFAULT_CHUNKSIZE):
+        """Re-encodes the stored metadata of every row with a given codec.
+
+        The codec also becomes the default for rows added later on.
+
+        Parameters
+        ----------
+        codec_name : str
+            One of the keys of `kpub.codec.CODECS`.
+
+        vacuum : bool
+            If `True`, run VACUUM afterwards to reclaim the freed pages.
+
+        chunksize : int
+            Number of rows re-encoded per `executemany` call.
+        """
+        if codec_name not in codec.CODECS:
+            raise ValueError("Unknown codec '{}', choose from {}.".format(
+                             codec_name, ", ".join(sorted(codec.CODECS))))
+        with self.connections.transaction():
+            rowids = [row[0] for row in
+                      self.con.execute("SELECT rowid FROM pubs;")]
+            for chunk in _chunks(rowids, chunksize):
+                cur = self.con.execute("SELECT rowid, metrics, codec FROM pubs "
+                                       "WHERE rowid IN ({});".format(
+                                           ", ".join("?" * len(chunk))),
+                                       chunk)
+                self.con.executemany("UPDATE pubs SET metrics = ?, codec = ? "
+                                     "WHERE rowid = ?;",
+                                     [(codec.encode(codec.decode(metrics, old),
+                                                    codec_name),
+                                       codec_name, rowid)
+                                      for rowid, metrics, old in cur.fetchall()])
+            self._set_meta("codec", codec_name)
+        if vacuum:
+            self.con.execute("VACUUM;")
+
+    def reindex(self):
+        """Rebuilds the author and full-text indexes from the stored metadata."""
+        with self.connections.transaction():
+            self._bump_generation()
+            self.con.execute("DELETE FROM pub_authors;")
+            rows = [(rowid, codec.decode(metrics, codec_name))
+                    for rowid, metrics, codec_name in self.con.execute(
+                        "SELECT rowid, metrics, codec FROM pubs;")]
+            self._index_authors((rowid, metadata.get("author_norm"))
+                                for rowid, metadata in rows)
+            if self.full_text:
+                self.con.execute("INSERT INTO pubs_fts (pubs_fts) "
+                                 "VALUES ('delete-all');")
+                self._index_text(rows)
 
     def __contains__(self, article):
-        count = self.con.execute("SELECT COUNT(*) FROM pubs WHERE id = ? OR bibcode = ?;",
-                                 [article.id, article.bibcode]).fetchone()[0]
-        return bool(count)
+        """Returns `True` if an article, or another version of it, is stored.
+
+        The article matches a publication with the same ADS id, or one
+        whose bibcode or alternate bibcodes include any of the article's
+        bibcode, `alternate_bibcode` and `identifier`, so that the journal
+        version of a stored arXiv preprint is recognized, and vice versa.
+        """
+        ids, bibcodes = self._membership()
+        if article.id in ids or article.bibcode in bibcodes:
+            return True
+        # The raw metadata is used, because missing attributes are lazy-loaded
+        metadata = getattr(article, "_raw", None) or {}
+        return any(key in bibcodes
+                   for name in ("alternate_bibcode", "identifier")
+                   for key in metadata.get(name) or [])
+
+    def _membership(self):
+        """Returns the sets of ids and of (alternate) bibcodes in the db.
+
+        The sets are built on first use and kept up to date by the methods
+        writing to the pubs table through `con`.  Changes committed by other
+        connections, e.g. other processes, increase `PRAGMA data_version`,
+        in which case the sets are rebuilt.
+        """
+        data_version = self.con.execute("PRAGMA data_version;").fetchone()[0]
+        if self._members is None or self._members[0] != data_version:
+            ids, bibcodes = set(), set()
+            for id_, bibcode, metrics, codec_name in self.con.execute(
+                    "SELECT id, bibcode, metrics, codec FROM pubs;"):
+                ids.add(id_)
+                bibcodes.add(bibcode)
+                bibcodes.update(codec.decode(metrics, codec_name)
+                                .get("alternate_bibcode") or [])
+            ids.discard(None)
+            self._members = (data_version, ids, bibcodes)
+        return self._members[1], self._members[2]
 
     def query(self, mission=None, science=None, year=None):
         """Query the database by mission and/or science and/or year.
@@ -202,60 +1069,182 @@ class PublicationDB(object):
         rows : list
             List of SQLite result rows.
         """
-        # Build the query
+        where, params = self._where(mission=mission, science=science, year=year)
+        cur = self.reader.execute("SELECT year, month, "
+                                  "kpub_json(metrics, codec), bibcode "
+                                  "FROM pubs "
+                                  "WHERE {} "
+                                  "ORDER BY date DESC, bibcode DESC;"
+                                  .format(where), params)
+        return cur.fetchall()
+
+    def query_iter(self, mission=None, science=None, year=None,
+                   batchsize=DEFAULT_BATCHSIZE, after=None):
+        """Iterates over the rows of `query` without loading them all at once.
+
+        Rows are fetched in batches of `batchsize`, most recent first, using
+        keyset pagination on (date, bibcode), so that no cursor is held open
+        between batches and an iteration can be resumed later on.
+
+        Parameters
+        ----------
+        mission, science, year :
+            See `query`.
+
+        batchsize : int
+            Number of rows fetched per query.
+
+        after : (date, bibcode) tuple, optional
+            Only return the rows which sort after this position,
+            e.g. `(row[4], row[3])` of the last row seen.
+
+        Yields
+        ------
+        row : tuple
+            (year, month, metrics, bibcode, date), where `metrics`
+            is the JSON metadata.
+        """
+        where, params = self._where(mission=mission, science=science, year=year)
+        return self._iter_rows("year, month, kpub_json(metrics, codec), bibcode",
+                               where, params, batchsize, after)
+
+    def iter_all(self, mission=None, science=None, year=None,
+                 batchsize=DEFAULT_BATCHSIZE, after=None):
+        """Iterates over the publications, most recent first.
+
+        This is the streaming equivalent of `get_all`, see `query_iter`.
+        To resume an iteration, pass `after=(pub.pubdate, pub.bibcode)`
+        of the last `Publication` seen.
+
+        Yields
+        ------
+        publication : `Publication`
+        """
+        where, params = self._where(mission=mission, science=science, year=year)
+        for row in self._iter_rows(PUBLICATION_COLUMNS, where, params,
+                                   batchsize, after):
+            yield Publication(*row[:-1], db=self)
+
+    def _iter_rows(self, columns, where, params, batchsize, after):
+        """Yields the selected columns plus the date, sorted by (date, bibcode)."""
+        while True:
+            if after is None:
+                clause, cursor = where, []
+            else:
+                clause, cursor = where + " AND (date, bibcode) < (?, ?)", list(after)
+            rows = self.reader.execute("SELECT {}, date, bibcode "
+                                       "FROM pubs "
+                                       "WHERE {} "
+                                       "ORDER BY date DESC, bibcode DESC "
+                                       "LIMIT ?;".format(columns, clause),
+                                       params + cursor + [batchsize]).fetchall()
+            for row in rows:
+                yield row[:-1]
+            if len(rows) < batchsize:
+                return
+            after = rows[-1][-2:]
+
+    def _where(self, mission=None, science=None, year=None):
+        """Returns the WHERE clause and parameters used by `query`.
+
+        If `mission` is None, the clause selects all the `MISSIONS`,
+        i.e. it excludes the articles classified as "unrelated".
+        """
         if mission is None:
-            where = "(mission = 'kepler' OR mission = 'k2') "
+            where = "mission IN ({})".format(", ".join("?" * len(MISSIONS)))
+            params = list(MISSIONS)
         else:
-            where = "(mission = '{}') ".format(mission)
+            where = "mission = ?"
+            params = [mission]
 
         if science is not None:
-            where += " AND science = '{}' ".format(science)
+            where += " AND science = ?"
+            params.append(science)
 
         if year is not None:
             if isinstance(year, (list, tuple)):  # Multiple years?
-                str_year = ["'{}'".format(y) for y in year]
-                where += " AND year IN (" + ", ".join(str_year) + ")"
+                where += " AND year IN ({})".format(", ".join("?" * len(year)))
+                params.extend(str(y) for y in year)
             else:
-                where += " AND year = '{}' ".format(year)
+                where += " AND year = ?"
+                params.append(str(year))
+        return where, params
 
-        cur = self.con.execute("SELECT year, month, metrics, bibcode "
-                               "FROM pubs "
-                               "WHERE {} "
-                               "ORDER BY date DESC; ".format(where))
-        return cur.fetchall()
+    def search(self, query, mission=None, science=None, limit=20):
+        """Returns the publications matching a full-text search query.
+
+        The title, abstract, keywords and author names are searched.
+        Results are ranked by relevance using the BM25 algorithm,
+        with matches in the title and keywords weighted more heavily.
+
+        Parameters
+        ----------
+        query : str
+            SQLite FTS5 query, e.g. 'asteroseismology AND "red giants"'.
+
+        mission : str
+            'kepler' or 'k2'
+
+        science : str
+            'exoplanets' or 'astrophysics'
+
+        limit : int
+            Maximum number of publications to return.
+
+        Returns
+        -------
+        articles : list of dict
+            Metadata of the matching publications, best match first.
+
+        Raises
+        ------
+        RuntimeError
+            If SQLite does not support full-text search, see `full_text`.
+        """
+        if not self.full_text:
+            raise RuntimeError("Full-text search is not available, because "
+                               "SQLite was built without FTS5 support.")
+        where, params = self._where(mission=mission, science=science)
+        cur = self.reader.execute("SELECT {} FROM pubs_fts "
+                                  "JOIN pubs ON pubs.rowid = pubs_fts.rowid "
+                                  "WHERE pubs_fts MATCH ? AND {} "
+                                  "ORDER BY bm25(pubs_fts, 4.0, 1.0, 2.0, 1.0) "
+                                  "LIMIT ?;".format(PUBLICATION_COLUMNS, where),
+                                  [query] + params + [limit])
+        return [Publication(*row, db=self) for row in cur]
 
     def get_metadata(self, bibcode):
         """Returns a dictionary of the raw metadata given a bibcode."""
-        cur = self.con.execute("SELECT metrics FROM pubs WHERE bibcode = ?;", [bibcode])
-        return json.loads(cur.fetchone()[0])
+        cur = self.reader.execute("SELECT metrics, codec FROM pubs "
+                                  "WHERE bibcode = ?;", [bibcode])
+        return codec.decode(*cur.fetchone())
 
     def to_markdown(self, title="Publications",
                     group_by_month=False, save_as=None, **kwargs):
         """Returns the publication list in markdown format.
         """
-        if group_by_month:
-            group_idx = 1
-        else:
-            group_idx = 0  # by year
-
-        articles = collections.OrderedDict({})
-        for row in self.query(**kwargs):
-            group = row[group_idx]
+        def group_key(art):
+            group = art.pubdate[0:7] if group_by_month else art.year
             if group.endswith("-00"):
                 group = group[:-3] + "-01"
-            if group not in articles:
-                articles[group] = []
-            art = json.loads(row[2])
-            # The markdown template depends on "property" being iterable
-            if art["property"] is None:
-                art["property"] = []
-            articles[group].append(art)
+            return group
+
+        def prepare(articles):
+            for art in articles:
+                # The markdown template depends on "property" being iterable
+                if art["property"] is None:
+                    art["property"] = []
+                yield art
+
+        # Stream the publications one group at a time into the template
+        articles = ((group, prepare(arts)) for group, arts in
+                    itertools.groupby(self.iter_all(**kwargs), key=group_key))
 
         templatedir = os.path.join(PACKAGEDIR, 'templates')
         env = jinja2.Environment(loader=jinja2.FileSystemLoader(templatedir))
         template = env.get_template('template.md')
-        markdown = template.render(title=title, save_as=save_as,
-                                   articles=articles)
+        markdown = "".join(template.generate(title=title, save_as=save_as,
+                                             articles=articles))
         if sys.version_info >= (3, 0):
             return markdown  # Python 3
         else:
@@ -296,6 +1285,7 @@ class PublicationDB(object):
             plot.plot_author_count(self,
                                    "kpub-author-count.{}".format(extension))
 
+    @cached
     def get_metrics(self, year=None):
         """Returns a dictionary of overall publication statistics.
 
@@ -306,133 +1296,230 @@ class PublicationDB(object):
         * # of peer-reviewed pubs.
         * # of Kepler/K2/exoplanet/astrophysics.
         """
-        metrics = {
-                   "publication_count": 0,
-                   "kepler_count": 0,
-                   "k2_count": 0,
-                   "exoplanets_count": 0,
-                   "astrophysics_count": 0,
-                   "refereed_count": 0,
-                   "kepler_refereed_count": 0,
-                   "k2_refereed_count": 0,
-                   "citation_count": 0,
-                   "kepler_citation_count": 0,
-                   "k2_citation_count": 0,
-                   "phd_count": 0,
-                   "kepler_phd_count": 0,
-                   "k2_phd_count": 0
-                   }
-        authors, first_authors = [], []
-        k2_authors, kepler_authors = [], []
-        k2_first_authors, kepler_first_authors = [], []
-        for article in self.query(year=year):
-            api_response = article[2]
-            js = json.loads(api_response)
-            metrics["publication_count"] += 1
-            metrics["{}_count".format(js["mission"])] += 1
-            if "PhDT" in js["bibcode"]:
-                metrics["phd_count"] += 1
-                metrics["{}_phd_count".format(js["mission"])] += 1
-            try:
-                metrics["{}_count".format(js["science"])] += 1
-            except KeyError:
-                log.warning("{}: no science category".format(js["bibcode"]))
-            authors.extend(js["author_norm"])
-            first_authors.append(js["first_author_norm"])
-            if js["mission"] == 'k2':
-                k2_authors.extend(js["author_norm"])
-                k2_first_authors.append(js["first_author_norm"])
-            else:
-                kepler_authors.extend(js["author_norm"])
-                kepler_first_authors.append(js["first_author_norm"])
-            try:
-                if "REFEREED" in js["property"]:
-                    metrics["refereed_count"] += 1
-                    metrics["{}_refereed_count".format(js["mission"])] += 1
-            except TypeError:  # proprety is None
-                pass
-            try:
-                metrics["citation_count"] += js["citation_count"]
-                metrics["{}_citation_count".format(js["mission"])] += js["citation_count"]
-            except (KeyError, TypeError):
-                log.warning("{}: no citation_count".format(js["bibcode"]))
-        metrics["author_count"] = np.unique(authors).size
-        metrics["first_author_count"] = np.unique(first_authors).size
-        metrics["kepler_author_count"] = np.unique(kepler_authors).size
-        metrics["kepler_first_author_count"] = np.unique(kepler_first_authors).size
-        metrics["k2_author_count"] = np.unique(k2_authors).size
-        metrics["k2_first_author_count"] = np.unique(k2_first_authors).size
+        cube = self.get_metrics_cube(["mission", "science"], year=year)
+        metrics = {}
+        for prefix, filters in [("", {})] + [(m + "_", {"mission": m}) for m in MISSIONS]:
+            cell = cube.get(**filters)
+            metrics[prefix + "count" if prefix else "publication_count"] = \
+                cell["publication_count"]
+            for name in ["refereed_count", "citation_count", "phd_count",
+                         "author_count", "first_author_count"]:
+                metrics[prefix + name] = cell[name]
+        for science in SCIENCES:
+            metrics[science + "_count"] = \
+                cube.get(science=science)["publication_count"]
+        for science in cube.values("science"):
+            if science in SCIENCES:
+                continue
+            for mission in cube.values("mission"):
+                count = cube.get(mission=mission, science=science)["publication_count"]
+                if count > 0:
+                    log.warning("{} {} publication(s) without science "
+                                "category".format(count, mission))
         # Also compute fractions
         for frac in ["kepler", "k2", "exoplanets", "astrophysics"]:
             metrics[frac+"_fraction"] = metrics[frac+"_count"] / metrics["publication_count"]
         return metrics
 
-    def get_all(self, mission=None, science=None):
-        """Returns a list of dictionaries, one entry per publication."""
-        articles = self.query(mission=mission, science=science)
-        return [json.loads(art[2]) for art in articles]
+    @cached
+    def get_metrics_cube(self, dimensions=("year", "mission", "science",
+                                           "refereed", "doctype"),
+                         mission=None, science=None, year=None):
+        """Returns the publication metrics broken down by several dimensions.
+
+        The metrics are computed for every combination of values of the
+        dimensions, and for every roll-up of the dimensions, using one scan
+        of the publications and one of their authors.
+
+        Parameters
+        ----------
+        dimensions : list of str
+            Any of the keys of `CUBE_DIMENSIONS`.
+
+        mission, science, year :
+            Restrict the publications, as in `query`.
 
+        Returns
+        -------
+        cube : `MetricsCube` object
+            Use e.g. `cube.get(year=2015, mission='k2')["citation_count"]`.
+        """
+        for dimension in dimensions:
+            if dimension not in CUBE_DIMENSIONS:
+                raise ValueError("Unknown dimension '{}', choose from {}.".format(
+                                 dimension, ", ".join(CUBE_DIMENSIONS)))
+        columns = "".join(CUBE_DIMENSIONS[dimension] + ", "
+                          for dimension in dimensions)
+        group_by = ""
+        if dimensions:
+            group_by = "GROUP BY {}".format(
+                ", ".join(str(idx + 1) for idx in range(len(dimensions))))
+        where, params = self._where(mission, science, year)
+        cells = self.reader.execute("SELECT {}COUNT(*), "
+                                    "IFNULL(SUM(refereed = 1), 0), "
+                                    "IFNULL(SUM(instr(bibcode, 'PhDT') > 0), 0), "
+                                    "IFNULL(SUM(citation_count), 0) "
+                                    "FROM pubs WHERE {} {};".format(
+                                        columns, where, group_by),
+                                    params).fetchall()
+        authors = self.reader.execute("SELECT DISTINCT {}author_id, position = 0 "
+                                      "FROM pub_authors "
+                                      "JOIN pubs ON pubs.rowid = pub_authors.pub_rowid "
+                                      "WHERE {};".format(columns, where), params)
+        return MetricsCube(dimensions, [row for row in cells if row[-4] > 0], authors)
+
+    def get_all(self, mission=None, science=None):
+        """Returns a list of `Publication` objects, most recent first."""
+        where, params = self._where(mission=mission, science=science)
+        cur = self.reader.execute("SELECT {} FROM pubs "
+                                  "WHERE {} "
+                                  "ORDER BY date DESC, bibcode DESC;".format(
+                                      PUBLICATION_COLUMNS, where),
+                                  params)
+        return [Publication(*row, db=self) for row in cur]
+
+    @cached
     def get_most_cited(self, mission=None, science=None, top=10):
         """Returns the most-cited publications."""
-        bibcodes, citations = [], []
-        articles = self.query(mission=mission, science=science)
-        for article in articles:
-            api_response = article[2]
-            js = json.loads(api_response)
-            bibcodes.append(article[3])
-            if js["citation_count"] is None:
-                citations.append(0)
-            else:
-                citations.append(js["citation_count"])
-        idx_top = np.argsort(citations)[::-1][0:top]
-        return [json.loads(articles[idx][2]) for idx in idx_top]
+        return [pub for pub, _ in self.top_k("citation_count", top,
+                                             mission=mission, science=science)]
 
+    @cached
     def get_most_read(self, mission=None, science=None, top=10):
-        """Returns the most-cited publications."""
-        bibcodes, citations = [], []
-        articles = self.query(mission=mission, science=science)
-        for article in articles:
-            api_response = article[2]
-            js = json.loads(api_response)
-            bibcodes.append(article[3])
-            citations.append(js["read_count"])
-        idx_top = np.argsort(citations)[::-1][0:top]
-        return [json.loads(articles[idx][2]) for idx in idx_top]
+        """Returns the most-read publications."""
+        return [pub for pub, _ in self.top_k("read_count", top,
+                                             mission=mission, science=science)]
+
+    def top_k(self, metric="citation_count", k=10,
+              mission=None, science=None, year=None):
+        """Returns the `k` publications ranking highest on a metric.
+
+        Metrics stored in an indexed column are ranked by SQLite using
+        `ORDER BY ... LIMIT`, while derived metrics are computed on the fly
+        and ranked using a heap of size `k`, so that the full list is
+        never sorted.  Publications for which the metric is unknown
+        are ranked last.
+
+        Parameters
+        ----------
+        metric : str
+            'citation_count', 'read_count' or 'citations_per_year'.
+
+        k : int
+            Number of publications to return.
+
+        mission, science, year :
+            Restrict the ranking, as in `query`.
+
+        Returns
+        -------
+        ranking : list of (`Publication`, value) tuples
+            Highest-ranking publication first.
+        """
+        where, params = self._where(mission, science, year)
+        if metric in RANKED_COLUMNS:
+            cur = self.reader.execute("SELECT {}, {} FROM pubs "
+                                      "WHERE {} "
+                                      "ORDER BY {} DESC "
+                                      "LIMIT ?;".format(PUBLICATION_COLUMNS, metric,
+                                                        where, metric),
+                                      params + [k])
+            return [(Publication(*row[:-1], db=self), row[-1]) for row in cur]
+        if metric not in RANKED_METRICS:
+            raise ValueError("Cannot rank by '{}', choose from {}.".format(
+                             metric, ", ".join(RANKED_COLUMNS + sorted(RANKED_METRICS))))
+        columns, func = RANKED_METRICS[metric]
+        cur = self.reader.execute("SELECT rowid, {} FROM pubs WHERE {};".format(
+                                  columns, where), params)
+        # Unknown values sort before any number, i.e. rank last
+        ranking = heapq.nlargest(k, ((func(*row[1:]), row[0]) for row in cur),
+                                 key=lambda item: (item[0] is not None, item[0]))
+        rows = self.reader.execute("SELECT rowid, {} FROM pubs "
+                                   "WHERE rowid IN ({});".format(
+                                       PUBLICATION_COLUMNS,
+                                       ", ".join("?" * len(ranking))),
+                                   [rowid for _, rowid in ranking])
+        pubs = {row[0]: Publication(*row[1:], db=self) for row in rows}
+        return [(pubs[rowid], value) for value, rowid in ranking]
+
+    @cached
+    def h_index(self, mission=None, science=None):
+        """Returns the h-index of the publications.
+
+        The h-index is the largest number h such that h publications
+        have been cited at least h times each.  The citation counts are
+        read in decreasing order and only until the index is found.
+        """
+        where, params = self._where(mission=mission, science=science)
+        cur = self.reader.execute("SELECT citation_count FROM pubs "
+                                  "WHERE {} AND citation_count IS NOT NULL "
+                                  "ORDER BY citation_count DESC;".format(where),
+                                  params)
+        h = 0
+        for (citations,) in cur:
+            if citations <= h:
+                break
+            h += 1
+        return h
 
+    @cached
     def get_most_active_first_authors(self, min_papers=6):
         """Returns names and paper counts of the most active first authors."""
-        articles = self.query()
-        authors = {}
-        for article in articles:
-            api_response = article[2]
-            js = json.loads(api_response)
-            first_author = js["first_author_norm"]
-            try:
-                authors[first_author] += 1
-            except KeyError:
-                authors[first_author] = 1
-        names = np.array(list(authors.keys()))
-        paper_count = np.array(list(authors.values()))
-        idx_top = np.argsort(paper_count)[::-1]
-        mask = paper_count[idx_top] >= min_papers
-        return zip(names[idx_top], paper_count[idx_top[mask]])
+        where, params = self._where()
+        cur = self.reader.execute("SELECT first_author_norm, COUNT(*) AS n "
+                                  "FROM pubs "
+                                  "WHERE {} "
+                                  "GROUP BY first_author_norm "
+                                  "HAVING n >= ? "
+                                  "ORDER BY n DESC;".format(where),
+                                  params + [min_papers])
+        return cur.fetchall()
 
+    @cached
     def get_all_authors(self, top=20):
-        articles = self.query()
-        authors = {}
-        for article in articles:
-            api_response = article[2]
-            js = json.loads(api_response)
-            for auth in js["author_norm"]:
-                try:
-                    authors[auth] += 1
-                except KeyError:
-                    authors[auth] = 1
-        names = np.array(list(authors.keys()))
-        paper_count = np.array(list(authors.values()))
-        idx_top = np.argsort(paper_count)[::-1][:top]
-        return names[idx_top], paper_count[idx_top]
+        """Returns the names and paper counts of the most prolific authors."""
+        where, params = self._where()
+        cur = self.reader.execute("SELECT authors.name, COUNT(*) AS n "
+                                  "FROM pub_authors "
+                                  "JOIN authors ON authors.id = pub_authors.author_id "
+                                  "JOIN pubs ON pubs.rowid = pub_authors.pub_rowid "
+                                  "WHERE {} "
+                                  "GROUP BY pub_authors.author_id "
+                                  "ORDER BY n DESC "
+                                  "LIMIT ?;".format(where),
+                                  params + [top])
+        rows = cur.fetchall()
+        names = np.array([row[0] for row in rows])
+        paper_count = np.array([row[1] for row in rows])
+        return names, paper_count
+
+    @cached
+    def get_publications_by_author(self, name, mission=None, science=None,
+                                   first_author=False):
+        """Returns the publications of an author, most recent first.
 
+        Parameters
+        ----------
+        name : str
+            Normalized author name, e.g. "Barentsen, G".
+
+        first_author : bool
+            If `True`, only return the papers first-authored by `name`.
+        """
+        where, params = self._where(mission=mission, science=science)
+        subquery = ("SELECT pub_rowid FROM pub_authors "
+                    "JOIN authors ON authors.id = pub_authors.author_id "
+                    "WHERE authors.name = ?")
+        if first_author:
+            subquery += " AND position = 0"
+        cur = self.reader.execute("SELECT {} FROM pubs "
+                                  "WHERE {} AND rowid IN ({}) "
+                                  "ORDER BY date DESC, bibcode DESC;".format(
+                                      PUBLICATION_COLUMNS, where, subquery),
+                                  params + [name])
+        return [Publication(*row, db=self) for row in cur]
+
+    @cached
     def get_annual_publication_count(self, year_begin=2009, year_end=datetime.datetime.now().year):
         """Returns a dict containing the number of publications per year per mission.
 
@@ -444,27 +1531,9 @@ class PublicationDB(object):
         year_end : int
             Year to end counting. (default: current year)
         """
-        # Initialize a dictionary to contain the data to plot
-        result = {}
-        for mission in MISSIONS:
-            result[mission] = {}
-            for year in range(year_begin, year_end + 1):
-                result[mission][year] = 0
-            cur = self.con.execute("SELECT year, COUNT(*) FROM pubs "
-                                   "WHERE mission = ? "
-                                   "AND year >= '2009' "
-                                   "GROUP BY year;",
-                                   [mission])
-            rows = list(cur.fetchall())
-            for row in rows:
-                if int(row[0]) <= year_end:
-                    result[mission][int(row[0])] = row[1]
-        # Also combine counts
-        result['both'] = {}
-        for year in range(year_begin, year_end + 1):
-            result['both'][year] = sum(result[mission][year] for mission in MISSIONS)
-        return result
+        return self._annual_counts(year_begin, year_end, cumulative=False)
 
+    @cached
     def get_annual_publication_count_cumulative(self, year_begin=2009, year_end=datetime.datetime.now().year):
         """Returns a dict containing the cumulative number of publications per year per mission.
 
@@ -476,38 +1545,747 @@ class PublicationDB(object):
         year_end : int
             Year to end counting. (default: current year)
         """
-        # Initialize a dictionary to contain the data to plot
+        return self._annual_counts(year_begin, year_end, cumulative=True)
+
+    def _annual_counts(self, year_begin, year_end, cumulative):
+        """Returns the annual counts as a dict of dicts, keyed by mission."""
+        years, counts = self.timeseries("Y", cumulative=cumulative,
+                                        start=year_begin, end=year_end)
+        years = years.tolist()
         result = {}
         for mission in MISSIONS:
-            result[mission] = {}
-            for year in range(year_begin, year_end + 1):
-                cur = self.con.execute("SELECT COUNT(*) FROM pubs "
-                                       "WHERE mission = ? "
-                                       "AND year <= ?;",
-                                       [mission, str(year)])
-                result[mission][year] = cur.fetchone()[0]
+            result[mission] = dict(zip(years, counts[mission].tolist()))
         # Also combine counts
         result['both'] = {}
         for year in range(year_begin, year_end + 1):
             result['both'][year] = sum(result[mission][year] for mission in MISSIONS)
         return result
 
-    def update(self, month=None,
-               exclude=['keplerian', 'johannes', 'k<sub>2</sub>',
-                        "kepler equation", "kepler's equation", "xmm-newton",
-                        "kepler's law", "kepler's third law", "kepler problem",
-                        "kepler crater", "kepler's supernova", "kepler's snr"]
-               ):
-        """Query ADS for new publications.
+    @cached
+    def timeseries(self, freq="Y", by=("mission",), cumulative=False,
+                   align="calendar", start=None, end=None,
+                   mission=None, science=None):
+        """Returns the number of publications per period.
+
+        All the counts are obtained from a single query of the summary table
+        maintained by triggers, and returned as dense arrays, i.e. periods
+        without publications are included with a count of zero.
+
+        Parameters
+        ----------
+        freq : str
+            Length of the periods: 'M' (month), 'Q' (quarter) or 'Y' (year).
+
+        by : list of str
+            Columns to break the counts down by, taken from
+            'mission', 'science' and 'refereed'.
+
+        cumulative : bool
+            If `True`, return the number of publications up to and including
+            each period, rather than the number within each period.
+
+        align : str
+            'calendar' or 'mission_start'.  The latter counts the periods
+            from the start of each mission (see `MISSION_START`),
+            which makes the missions directly comparable; it requires
+            'mission' to be one of the `by` columns.
+
+        start, end : int or str, optional
+            First and last period returned.  Calendar periods are given as a
+            year (e.g. 2015), or as 'YYYY-MM' or 'YYYYQn' strings.  When
+            aligned on mission start, they are the number of periods since
+            the start.  Defaults to the range of the data, or to the
+            start of the missions when aligned on mission start.
+
+        mission : str, optional
+            'kepler' or 'k2'.  Defaults to all the `MISSIONS`.
+
+        science : str, optional
+            'exoplanets' or 'astrophysics'.  Defaults to all.
+
+        Returns
+        -------
+        periods : `numpy.ndarray`
+            Period labels: years (int) for freq 'Y', 'YYYYQn' or 'YYYY-MM'
+            strings otherwise, or offsets (int) when aligned on mission start.
+
+        counts : dict of `numpy.ndarray`
+            Counts for every period, keyed by the value of the `by` column,
+            or by a tuple of values if there are several.  If `by` is empty,
+            a single array is returned instead of a dict.
+        """
+        if freq not in ("M", "Q", "Y"):
+            raise ValueError("freq must be 'M', 'Q' or 'Y'.")
+        if align not in ("calendar", "mission_start"):
+            raise ValueError("align must be 'calendar' or 'mission_start'.")
+        by = list(by)
+        domains = {"mission": MISSIONS if mission is None else [mission],
+                   "science": SCIENCES if science is None else [science],
+                   "refereed": [1, 0, -1]}
+        for column in by:
+            if column not in domains:
+                raise ValueError("Cannot break the counts down by '{}', "
+                                 "choose from {}.".format(
+                                     column, ", ".join(sorted(domains))))
+        if align == "mission_start" and "mission" not in by:
+            raise ValueError("Aligning on mission start requires 'mission' "
+                             "to be one of the `by` columns.")
+
+        # Periods are numbered consecutively, e.g. year * 4 + quarter
+        year = "CAST(year AS INTEGER)"
+        if freq != "Y":
+            year = "CAST(substr(month, 1, 4) AS INTEGER)"
+        # ADS uses month 00 if the month is unknown; count it as January
+        month = "(MAX(CAST(substr(month, 6, 2) AS INTEGER), 1) - 1)"
+        period = {"Y": year,
+                  "Q": "{} * 4 + {} / 3".format(year, month),
+                  "M": "{} * 12 + {}".format(year, month)}[freq]
+        where, params = self._where(mission, science)
+        columns = "".join(", " + column for column in by)
+        cur = self.reader.execute("SELECT {} AS period{}, SUM(count) "
+                                  "FROM pub_counts WHERE {} "
+                                  "GROUP BY period{};".format(
+                                      period, columns, where, columns),
+                                  params)
+        rows = []
+        for row in cur:
+            if row[0] is None:
+                continue
+            key = tuple(row[1:-1])
+            offset = 0
+            if align == "mission_start":
+                offset = _period_index(MISSION_START[key[by.index("mission")]], freq)
+            rows.append((row[0] - offset, key, row[-1]))
+
+        if align == "calendar":
+            first = None if start is None else _period_index(start, freq)
+            last = None if end is None else _period_index(end, freq, last=True)
+        else:
+            first, last = (0 if start is None else start), end
+        periods = [period for period, _, _ in rows]
+        if first is None:
+            first = min(periods) if periods else 0
+        if last is None:
+            last = max(periods) if periods else first - 1
+        # Earlier periods are kept until the cumulative sum is taken
+        origin = min(periods + [first])
+
+        groups = list(itertools.product(*[domains[column] for column in by]))
+        index = {key: idx for idx, key in enumerate(groups)}
+        counts = np.zeros((len(groups), max(last - origin + 1, 0)), dtype=int)
+        for period, key, count in rows:
+            if key in index and period <= last:
+                counts[index[key], period - origin] += count
+        if cumulative:
+            counts = np.cumsum(counts, axis=1)
+        counts = counts[:, first - origin:]
+
+        numbers = np.arange(first, last + 1)
+        if align == "mission_start" or freq == "Y":
+            labels = numbers
+        else:
+            labels = np.array([_period_label(n, freq) for n in numbers])
+        if not by:
+            return labels, counts[0]
+        if len(by) == 1:
+            groups = [key[0] for key in groups]
+        return labels, dict(zip(groups, counts))
+
+    def iter_cumulative_metrics(self, freq="Y", start=None, end=None,
+                                mission=None, science=None, earlier=True):
+        """Yields the cumulative publication and author counts per period.
+
+        The table is read once, in chronological order, while the sets
+        of unique (first) authors seen so far are kept up to date.  This is
+        much cheaper than calling `get_metrics` for a growing list of years.
+
+        Parameters
+        ----------
+        freq : str
+            'M', 'Q' or 'Y', see `timeseries`.
+
+        start, end : int or str, optional
+            First and last period yielded, see `timeseries`.
+            Default to the first and last period of the data.
+
+        mission : str, optional
+            'kepler' or 'k2'.  Defaults to all the `MISSIONS`.
+
+        science : str, optional
+            'exoplanets' or 'astrophysics'.  Defaults to all.
+
+        earlier : bool
+            If `True`, the publications from before `start` are included
+            in the counts, otherwise the counts start at `start`, as they
+            do for `get_metrics` given the years from `start` onwards.
+
+        Yields
+        ------
+        period, metrics : tuple
+            The period label, as in `timeseries`, and a dict with the keys
+            'publication_count', 'author_count', 'first_author_count' and
+            '<mission>_count', counting all publications up to and
+            including the period.
+        """
+        first = None if start is None else _period_index(start, freq)
+        last = None if end is None else _period_index(end, freq, last=True)
+        where, params = self._where(mission, science)
+        cur = self.reader.execute("SELECT pubs.rowid, year, month, mission, "
+                                  "author_id, position "
+                                  "FROM pubs "
+                                  "LEFT JOIN pub_authors "
+                                  "ON pub_authors.pub_rowid = pubs.rowid "
+                                  "WHERE {} "
+                                  "ORDER BY {}, pubs.rowid;".format(
+                                      where, "year" if freq == "Y" else "month"),
+                                  params)
+        counts = collections.Counter()
+        authors, first_authors = set(), set()
+
+        def metrics():
+            result = {"publication_count": sum(counts.values()),
+                      "author_count": len(authors),
+                      "first_author_count": len(first_authors)}
+            for name in MISSIONS:
+                result[name + "_count"] = counts[name]
+            return result
+
+        current, previous_rowid = first, None
+        for rowid, year, month, pub_mission, author_id, position in cur:
+            date = year if freq == "Y" else month
+            if date is None:
+                continue
+            number = _period_index(date, freq)
+            if not earlier and first is not None and number < first:
+                continue
+            if current is None:
+                current = number
+            # Emit the periods which ended before this publication
+            while current < number and (last is None or current <= last):
+                if first is None or current >= first:
+                    yield _period_label(current, freq), metrics()
+                current += 1
+            if last is not None and number > last:
+                break
+            if rowid != previous_rowid:
+                counts[pub_mission] += 1
+                previous_rowid = rowid
+            if author_id is not None:
+                authors.add(author_id)
+                if position == 0:
+                    first_authors.add(author_id)
+        if current is None:
+            return
+        if last is None:
+            last = current
+        while current <= last:
+            if first is None or current >= first:
+                yield _period_label(current, freq), metrics()
+            current += 1
+
+    @cached
+    def get_science_count(self):
+        """Returns a dict containing the number of publications per science."""
+        result = {science: 0 for science in SCIENCES}
+        cur = self.reader.execute("SELECT science, SUM(count) FROM pub_counts "
+                                  "GROUP BY science;")
+        for science, count in cur:
+            if science in result:
+                result[science] = count
+        return result
+
+    def backfill(self, profile="full", bibcodes=None, client=None,
+                 batchsize=DEFAULT_FETCH_BATCHSIZE):
+        """Fetches the fields of a profile which the stored rows lack.
+
+        Rows added with a smaller profile than `profile` are looked up in
+        ADS in batches, and the missing fields are merged into their metadata.
+
+        Parameters
+        ----------
+        profile : str
+            Name of one of the `FIELD_PROFILES`.
+
+        bibcodes : list of str, optional
+            Only consider these publications.
+
+        client : `kpub.fetch.ADSClient`, optional
+            Client used to query ADS.
+
+        batchsize : int
+            Number of bibcodes looked up per ADS query.
+
+        Returns
+        -------
+        outcomes : list of (bibcode, outcome) tuples
+            Where outcome is "updated" or "missing", for the rows which
+            lacked some of the fields.
+        """
+        wanted = set(FIELD_PROFILES[profile])
+        if bibcodes is None:
+            cur = self.reader.execute("SELECT bibcode, fields FROM pubs "
+                                      "WHERE fields IS NOT NULL;")
+        else:
+            cur = self.reader.execute("SELECT bibcode, fields FROM pubs "
+                                      "WHERE fields IS NOT NULL "
+                                      "AND bibcode IN ({});".format(
+                                          ", ".join("?" * len(bibcodes))),
+                                      bibcodes)
+        needed = collections.OrderedDict()
+        for bibcode, fields in cur.fetchall():
+            if wanted - _field_set(fields):
+                needed[bibcode] = wanted - _field_set(fields)
+        if not needed:
+            return []
+        log.info("Fetching the missing fields of {} publication(s).".format(
+                 len(needed)))
+        batches = list(_chunks(list(needed), batchsize))
+        # The identifiers are needed to match the articles with the rows
+        fl = sorted(set.union(*needed.values()) |
+                    set(["bibcode", "alternate_bibcode", "identifier"]))
+        if client is None:
+            client = ADSClient()
+        with client:
+            matches = [_match_bibcodes(batch, articles) for batch, articles in
+                       zip(batches, client.search_many(
+                           [_identifier_query(batch) for batch in batches],
+                           fl=fl))]
+
+        outcomes = []
+        with self.connections.transaction():
+            for batch, batch_matches in zip(batches, matches):
+                found = dict(batch_matches)
+                stored = {row[0]: row[1:] for row in self.con.execute(
+                          "SELECT bibcode, rowid, metrics, codec, fields "
+                          "FROM pubs WHERE bibcode IN ({});".format(
+                              ", ".join("?" * len(batch))), batch)}
+                rows, texts = [], []
+                for bibcode in batch:
+                    if bibcode not in found:
+                        outcomes.append((bibcode, "missing"))
+                        continue
+                    rowid, metrics, codec_name, fields = stored[bibcode]
+                    old_metadata = codec.decode(metrics, codec_name)
+                    metadata, fields = _merge_fields(
+                        dict(old_metadata), fields,
+                        found[bibcode]._raw, needed[bibcode])
+                    rows.append((codec.encode(metadata, codec_name or "json"),
+                                 fields, bibcode))
+                    texts.append((rowid, old_metadata, metadata))
+                    outcomes.append((bibcode, "updated"))
+                self.con.executemany("UPDATE pubs SET metrics = ?, fields = ? "
+                                     "WHERE bibcode = ?;", rows)
+                self._reindex_text(texts)
+        # The alternate bibcodes may have been fetched
+        self._members = None
+        return outcomes
+
+    def _from_cache(self, value):
+        """Reconnects the publications in a cached result to the database.
+
+        The `Publication` objects lose their database when they are copied
+        into the result cache, whereas they need it to backfill the fields
+        they lack, see `_backfill_publication`.
+        """
+        if isinstance(value, Publication):
+            value._db = self
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                self._from_cache(item)
+        return value
+
+    def _backfill_publication(self, pub, key):
+        """Fetches the fields of a `Publication` lacking `key`.
+
+        The missing fields of the smallest profile including `key` are
+        backfilled at once for all the rows lacking them, because the other
+        publications are likely to be accessed next, e.g. in a loop over
+        `get_all()`: this takes a few batched requests rather than one per
+        publication.  A profile which could not be fetched is not tried
+        again by this object.
+        """
+        profile = [name for name, fields in FIELD_PROFILES.items()
+                   if key in fields][0]
+        missing = set(FIELD_PROFILES[profile]) - _field_set(pub._fields)
+        row = self.reader.execute("SELECT metrics, codec, fields FROM pubs "
+                                  "WHERE bibcode = ?;",
+                                  [pub.bibcode]).fetchone()
+        if (row is not None and profile not in self._backfill_failed
+                and set(FIELD_PROFILES[profile]) - _field_set(row[2])):
+            try:
+                self.backfill(profile)
+            except ADSError as e:
+                log.warning("Could not fetch the '{}' fields: {}".format(
+                            profile, e))
+                self._backfill_failed.add(profile)
+            else:
+                row = self.reader.execute("SELECT metrics, codec, fields "
+                                          "FROM pubs WHERE bibcode = ?;",
+                                          [pub.bibcode]).fetchone()
+        if row is not None:
+            for field, value in codec.decode(row[0], row[1]).items():
+                if field in missing:
+                    pub.metadata[field] = value
+        # Do not try again for this object, whatever the outcome
+        pub._fields = _fields_value(_field_set(pub._fields) | missing)
+
+    def field_sizes(self):
+        """Returns the storage used by each field of the stored metadata.
+
+        Returns
+        -------
+        sizes : list of (field, count, nbytes) tuples
+            The number of rows holding the field and the total size of its
+            values, in bytes of (uncompressed) JSON, largest first.
+        """
+        counts, sizes = collections.Counter(), collections.Counter()
+        for metrics, codec_name in self.reader.execute("SELECT metrics, codec "
+                                                       "FROM pubs;"):
+            for field, value in codec.decode(metrics, codec_name).items():
+                counts[field] += 1
+                sizes[field] += len(json.dumps(value).encode("utf-8"))
+        return sorted([(field, counts[field], sizes[field]) for field in counts],
+                      key=lambda item: (-item[2], item[0]))
+
+    def refresh(self, client=None, full=False, profile=DEFAULT_PROFILE,
+                batchsize=DEFAULT_FETCH_BATCHSIZE):
+        """Updates the stored metadata of the publications changed in ADS.
+
+        Only the records which ADS re-indexed since the last refresh are
+        fetched, i.e. those whose `indexstamp` is newer than the watermark
+        stored in the meta table.  All the changes, including the new
+        watermark, are written in a single transaction.
+
+        Parameters
+        ----------
+        client : `kpub.fetch.ADSClient`, optional
+            Client used to query ADS.
+
+        full : bool
+            If `True`, ignore the watermark and fetch every record.
+
+        profile : str
+            Name of the `FIELD_PROFILES` to fetch.  Stored fields which
+            are not part of the profile are kept as they are.
+
+        batchsize : int
+            Number of bibcodes looked up per ADS query.
+
+        Returns
+        -------
+        outcomes : list of (bibcode, outcome) tuples
+            Where outcome is "updated", "unchanged", "missing" (not found
+            during a full refresh), or "duplicate" (ADS returned the record
+            of another publication in the db, e.g. after an arXiv preprint
+            was published in a journal).
+        """
+        watermark = None if full else self._get_meta("indexstamp")
+        bibcodes = [row[0] for row in
+                    self.reader.execute("SELECT bibcode FROM pubs ORDER BY rowid;")]
+        batches = list(_chunks(bibcodes, batchsize))
+        queries = [_identifier_query(batch) for batch in batches]
+        if watermark is not None:
+            queries = ['{} AND indexstamp:["{}" TO *]'.format(query, watermark)
+                       for query in queries]
+        fields = FIELD_PROFILES[profile]
+        if client is None:
+            client = ADSClient()
+        # Fetch everything first, so that a failure leaves the db untouched
+        with client:
+            matches = [_match_bibcodes(batch, articles,
+                                       warn_missing=watermark is None)
+                       for batch, articles in
+                       zip(batches, client.search_many(queries, fl=fields))]
+
+        outcomes = []
+        stamps = [] if watermark is None else [watermark]
+        codec_name = self.codec
+        with self.connections.transaction():
+            for batch, batch_matches in zip(batches, matches):
+                stored = {row[0]: row[1:] for row in self.con.execute(
+                          "SELECT bibcode, rowid, id, mission, science, "
+                          "metrics, codec, fields "
+                          "FROM pubs WHERE bibcode IN ({});".format(
+                              ", ".join("?" * len(batch))), batch)}
+                found = {}
+                for bibcode, article in batch_matches:
+                    found[bibcode] = article
+                    if article._raw.get("indexstamp"):
+                        stamps.append(article._raw["indexstamp"])
+                rows, authors, texts = [], [], []
+                for bibcode in batch:
+                    if bibcode not in found:
+                        outcomes.append((bibcode, "missing" if watermark
+                                         is None else "unchanged"))
+                        continue
+                    article = found[bibcode]
+                    (rowid, old_id, mission, science,
+                     metrics, old_codec, old_fields) = stored[bibcode]
+                    if article.bibcode != bibcode or article.id != old_id:
+                        other = self.con.execute(
+                            "SELECT bibcode FROM pubs WHERE (id = ? OR "
+                            "bibcode = ?) AND rowid != ?;",
+                            [article.id, article.bibcode, rowid]).fetchone()
+                        if other is not None:
+                            log.warning("{} is now {}, which duplicates {}: "
+                                        "use kpub-delete to remove one of "
+                                        "them.".format(bibcode, article.bibcode,
+                                                       other[0]))
+                            outcomes.append((bibcode, "duplicate"))
+                            continue
+                    old_metadata = codec.decode(metrics, old_codec)
+                    metadata, new_fields = _merge_fields(
+                        dict(old_metadata), old_fields, article._raw, fields)
+                    rows.append([article.id, article.bibcode, article.year,
+                                 article.pubdate[0:7], article.pubdate,
+                                 codec.encode(metadata, codec_name),
+                                 codec_name, new_fields] +
+                                list(_derived_columns(metadata)) + [rowid])
+                    authors.append((rowid, metadata.get("author_norm")))
+                    texts.append((rowid, old_metadata, metadata))
+                    outcomes.append((bibcode, "updated"))
+                self.con.executemany("UPDATE pubs SET id = ?, bibcode = ?, "
+                                     "year = ?, month = ?, date = ?, "
+                                     "metrics = ?, codec = ?, fields = ?, "
+                                     "citation_count = ?, read_count = ?, "
+                                     "refereed = ?, doctype = ?, "
+                                     "first_author_norm = ? "
+                                     "WHERE rowid = ?;", rows)
+                self.con.executemany("DELETE FROM pub_authors "
+                                     "WHERE pub_rowid = ?;",
+                                     [(rowid,) for rowid, _ in authors])
+                self._index_authors(authors)
+                self._reindex_text(texts)
+            if stamps:
+                self._set_meta("indexstamp", max(stamps))
+        # Publications may have been renamed
+        self._members = None
+        return outcomes
+
+    def harvest(self, months, exclude=DEFAULT_EXCLUDE, client=None,
+                profile=DEFAULT_PROFILE, rules=None):
+        """Queues the candidate publications of some months for review.
+
+        The ADS queries of `update` are sent for every month concurrently,
+        and the articles which are not in the database yet are added to
+        the candidates table, from which `review` picks them up.
+        Candidates which were queued before keep their review status.
+
+        Parameters
+        ----------
+        months : list of str
+            Months of the form "YYYY-MM".
+
+        exclude, rules :
+            See `update`.  Rejected candidates are queued as "rejected".
+
+        client : `kpub.fetch.ADSClient`, optional
+            Client used to query ADS.
+
+        profile : str
+            Name of the `FIELD_PROFILES` to fetch and store.
+
+        Returns
+        -------
+        counts : `collections.Counter`
+            Number of new candidates per review status.
+        """
+        self._attach_queue()
+        fields = FIELD_PROFILES[profile]
+        if rules is None:
+            rules = default_rules(exclude)
+        queries = [(month, source, query) for month in months
+                   for source, query in _update_queries(month)]
+        if client is None:
+            client = ADSClient()
+        counts = collections.Counter()
+        with client:
+            results = client.search_many([query for _, _, query in queries],
+                                         fl=fields)
+            for (month, source, _), articles in zip(queries, results):
+                for _, _, status in self._queue_candidates(month, source,
+                                                           articles, fields,
+                                                           rules):
+                    counts[status] += 1
+        with self.connections.transaction():
+            for month in months:
+                self._set_harvested(month)
+        return counts
+
+    def _queue_candidates(self, month, source, articles, fields, rules,
+                          start=0):
+        """Adds the articles found by one of the update queries to the queue.
+
+        Articles which are in the database or in the queue already are
+        ignored, the new articles found by the "keyword" query are triaged
+        using the `kpub.filters.RuleSet` given as `rules`.
+        Returns the (position, article, status) of the new articles.
+        """
+        articles = list(articles)
+        # An article may have been queued under another of its bibcodes,
+        # e.g. the arXiv bibcode of a journal article
+        keys = [[article.bibcode] +
+                list(article._raw.get("alternate_bibcode") or []) +
+                list(article._raw.get("identifier") or [])
+                for article in articles]
+        bibcodes = sorted(set(key for article_keys in keys
+                              for key in article_keys))
+        codec_name = self.codec
+        fields = _fields_value(set(fields))
+        new, rows = [], []
+        with self.connections.transaction():
+            existing = set()
+            for chunk in _chunks(bibcodes, DEFAULT_CHUNKSIZE):
+                existing.update(row[0] for row in self.con.execute(
+                    "SELECT bibcode FROM queue.candidates "
+                    "WHERE bibcode IN ({});"
+                    .format(", ".join("?" * len(chunk))), chunk))
+            for position, (article, article_keys) in enumerate(
+                    zip(articles, keys), start):
+                if existing.intersection(article_keys) or article in self:
+                    continue
+                existing.update(article_keys)
+                new.append((position, article, "pending"))
+            if source == "keyword":
+                rejections = rules.apply([article for _, article, _ in new])
+                new = [(position, article,
+                        "pending" if rule is None else "rejected")
+                       for (position, article, _), rule in zip(new, rejections)]
+            for position, article, status in new:
+                # Only the bibcode of a rejected candidate is worth keeping
+                if status == "rejected":
+                    metrics, metrics_codec = None, None
+                else:
+                    metrics = codec.encode(article._raw, codec_name)
+                    metrics_codec = codec_name
+                rows.append((article.bibcode, month, source, position, status,
+                             metrics, metrics_codec, fields, time.time()))
+            self.con.executemany("INSERT OR IGNORE INTO queue.candidates "
+                                 "(bibcode, month, source, position, status, "
+                                 "metrics, codec, fields, harvested) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);", rows)
+        return new
+
+    def review(self, month=None, statuses=("pending",)):
+        """Asks the user to classify the queued candidate publications.
+
+        The candidates are shown month by month, those which mention Kepler
+        in the acknowledgements first.  Every decision is stored at once,
+        so that a review can be interrupted and resumed later on.
 
         Parameters
         ----------
-        month : str
-            Of the form "YYYY-MM".
+        month : str, optional
+            Only review the candidates of this month.
+
+        statuses : list of str
+            Review the candidates with these `CANDIDATE_STATUSES`.
+        """
+        if ads is None:
+            log.error("This action requires the ADS key to be setup.")
+            return
+        self._attach_queue()
+        where = "status IN ({})".format(", ".join("?" * len(statuses)))
+        params = list(statuses)
+        if month is not None:
+            where += " AND month = ?"
+            params.append(month)
+        rows = self.con.execute("SELECT source, metrics, codec, fields "
+                                "FROM queue.candidates "
+                                "WHERE metrics IS NOT NULL AND {} "
+                                "ORDER BY month, source != 'ack', position;"
+                                .format(where), params).fetchall()
+        totals = collections.Counter(row[0] for row in rows)
+        counts = collections.Counter()
+        for source, metrics, codec_name, fields in rows:
+            counts[source] += 1
+            article = ads.search.Article(**codec.decode(metrics, codec_name))
+            self._review_candidate(article, _field_set(fields), _review_message(
+                source, counts[source], totals[source]))
+
+    def _review_candidate(self, article, fields, statusmsg):
+        """Asks the user to classify a queued candidate, and stores the outcome."""
+        if article in self:
+            # e.g. added by kpub-add after it was queued
+            status = "accepted"
+        else:
+            classification = self.classify_interactively(article, statusmsg)
+            if classification is None:
+                status = "skipped"
+            else:
+                mission, science = classification
+                self.add(article, mission=mission, science=science,
+                         fields=fields)
+                status = "rejected" if mission == "unrelated" else "accepted"
+        with self.connections.transaction():
+            self.con.execute("UPDATE queue.candidates "
+                             "SET status = ?, reviewed = ? WHERE bibcode = ?;",
+                             [status, time.time(), article.bibcode])
+            if status != "skipped":
+                self.con.execute("UPDATE queue.candidates "
+                                 "SET metrics = NULL, codec = NULL "
+                                 "WHERE bibcode = ?;", [article.bibcode])
+
+    def prune_queue(self, days=DEFAULT_QUEUE_RETENTION):
+        """Removes the candidates which were decided long ago from the queue.
+
+        Parameters
+        ----------
+        days : float
+            Remove the accepted and rejected candidates which were
+            reviewed, or rejected by the rules, more than `days` ago.
+
+        Returns
+        -------
+        count : int
+            Number of candidates removed.
+        """
+        self._attach_queue()
+        with self.connections.transaction():
+            cur = self.con.execute("DELETE FROM queue.candidates "
+                                   "WHERE status IN ('accepted', 'rejected') "
+                                   "AND COALESCE(reviewed, harvested) < ?;",
+                                   [time.time() - days * 86400])
+        return cur.rowcount
+
+    def update(self, month=None, exclude=DEFAULT_EXCLUDE, client=None,
+               profile=DEFAULT_PROFILE, harvest=None, skipped=False,
+               rules=None):
+        """Query ADS for new publications and review them.
+
+        The candidates found in ADS are added to the review queue (see
+        `harvest`) and reviewed as they arrive, after which the rest of the
+        queue is reviewed, e.g. the candidates queued by `kpub-harvest`.
+
+        Parameters
+        ----------
+        month : str or list of str
+            Of the form "YYYY-MM", or a range of months of the form
+            "YYYY-MM..YYYY-MM", or a list of months.  The ADS queries of
+            all the months are sent concurrently.
 
         exclude : list of str
             Ignore articles if they contain any of the strings given
             in this list. (Case-insensitive.)
+
+        client : `kpub.fetch.ADSClient`, optional
+            Client used to query ADS.
+
+        profile : str
+            Name of the `FIELD_PROFILES` to fetch and store.
+
+        harvest : bool, optional
+            Whether to query ADS for the months.  By default, ADS is only
+            queried for the months which were not harvested during the last
+            `DEFAULT_HARVEST_INTERVAL` seconds, so that an interrupted
+            review resumes at once.
+
+        skipped : bool
+            If `True`, also review the candidates which were skipped before.
+
+        rules : `kpub.filters.RuleSet`, optional
+            Rules triaging the candidates found by their title or abstract.
+            Defaults to `kpub.filters.default_rules(exclude)`.
         """
         if ads is None:
             log.error("This action requires the ADS key to be setup.")
@@ -521,97 +2299,431 @@ class PublicationDB(object):
         if input() == 'n':
             return
 
+        self._attach_queue()
         if month is None:
             month = datetime.datetime.now().strftime("%Y-%m")
+        if isinstance(month, (list, tuple)):
+            months = list(month)
+        else:
+            months = _month_range(month)
+        if harvest is None:
+            now = time.time()
+            months_to_harvest = [
+                m for m in months
+                if now - (self._harvested(m) or 0)
+                > DEFAULT_HARVEST_INTERVAL]
+        else:
+            months_to_harvest = months if harvest else []
+
+        if months_to_harvest:
+            # Search for the Kepler funding message in the acknowledgements,
+            # and for keywords in the title and abstracts
+            log.info("Querying ADS for acknowledgements, titles and abstracts "
+                     "(month={}).".format(", ".join(months_to_harvest)))
+            fields = FIELD_PROFILES[profile]
+            if rules is None:
+                rules = default_rules(exclude)
+            if client is None:
+                client = ADSClient()
+            # The queries of all the months are started concurrently, then
+            # their results are queued and reviewed page by page, in the
+            # order of the queue, while the next page is fetched.  An article
+            # found by several queries is only queued, and reviewed, once.
+            with client:
+                streams = [(m, [(source,
+                                 client.iter_search(query, fl=fields,
+                                                    rows=DEFAULT_REVIEW_ROWS))
+                                for source, query in _update_queries(m)])
+                           for m in months_to_harvest]
+                for m, month_streams in streams:
+                    for source, results in month_streams:
+                        position = 0
+                        for page in _chunks(results, DEFAULT_REVIEW_ROWS):
+                            for idx, article, status in self._queue_candidates(
+                                    m, source, page, fields, rules, position):
+                                if status == "pending":
+                                    self._review_candidate(
+                                        article, fields, _review_message(
+                                            source, idx + 1, results.num_found,
+                                            m if len(months) > 1 else None))
+                            position += len(page)
+                    with self.connections.transaction():
+                        self._set_harvested(m)
+            _log_rule_hits(rules)
+
+        # Then review the candidates which were queued earlier
+        self.review(statuses=("pending", "skipped") if skipped else ("pending",))
+        log.info('Finished reviewing all articles for {}.'.format(
+                 ", ".join(months)))
 
-        # First show all the papers with the Kepler funding message in the ack
-        log.info("Querying ADS for acknowledgements (month={}).".format(month))
-        database = "astronomy"
-        qry = ads.SearchQuery(q="""(ack:"Kepler mission"
-                                    OR ack:"K2 mission"
-                                    OR ack:"Kepler team"
-                                    OR ack:"K2 team")
-                                   -ack:"partial support from"
-                                   pubdate:"{}"
-                                   database:"{}"
-                                """.format(month, database),
-                              fl=FIELDS,
-                              rows=9999999999)
-        articles = list(qry)
-        for idx, article in enumerate(articles):
-            statusmsg = ("Showing article {} out of {} that mentions Kepler "
-                         "in the acknowledgements.\n\n".format(
-                            idx+1, len(articles)))
-            self.add_interactively(article, statusmsg=statusmsg)
-
-        # Then search for keywords in the title and abstracts
-        log.info("Querying ADS for titles and abstracts "
-                 "(month={}).".format(month))
-        qry = ads.SearchQuery(q="""(
-                                    abs:"Kepler"
-                                    OR abs:"K2"
-                                    OR abs:"KIC"
-                                    OR abs:"EPIC"
-                                    OR abs:"KOI"
-                                    OR abs:"8462852"
-                                    OR abs:"1145+017"
-                                    OR abs:"NGC 6791"
-                                    OR abs:"NGC 6819"
-                                    OR title:"Kepler"
-                                    OR title:"K2"
-                                    OR title:"8462852"
-                                    OR title:"1145+017"
-                                    OR full:"K2-ESPRINT"
-                                    OR full:"Kepler photometry"
-                                    OR full:"K2 photometry"
-                                    OR full:"Kepler lightcurve"
-                                    OR full:"K2 lightcurve"
-                                    )
-                                   pubdate:"{}"
-                                   database:"{}"
-                                """.format(month, database),
-                              fl=FIELDS,
-                              rows=9999999999)
-        articles = list(qry)
-
-        for idx, article in enumerate(articles):
-            # Ignore articles without abstract
-            if not hasattr(article, 'abstract') or article.abstract is None:
-                continue
-            abstract_lower = article.abstract.lower()
 
-            ignore = False
+##################
+# Helper functions
+##################
 
-            # Ignore articles containing any of the excluded terms
-            for term in exclude:
-                if term.lower() in abstract_lower:
-                    ignore = True
+def _period_index(value, freq, last=False):
+    """Returns the number of the period containing a year or month.
 
-            # Ignore articles already in the database
-            if article in self:
-                ignore = True
+    Parameters
+    ----------
+    value : int or str
+        A year, or a 'YYYY', 'YYYY-MM' or 'YYYYQn' string.
 
-            # Ignore all the unrefereed non-arxiv stuff
-            try:
-                if "NOT REFEREED" in article.property and article.pub.lower() != "arxiv e-prints":
-                    ignore = True
-            except (AttributeError, TypeError, ads.exceptions.APIResponseError):
-                pass  # no .pub attribute or .property not iterable
+    freq : str
+        'M', 'Q' or 'Y', see `PublicationDB.timeseries`.
 
-            # Ignore proposals and cospar abstracts
-            if ".prop." in article.bibcode or "cosp.." in article.bibcode:
-                ignore = True
+    last : bool
+        If `value` spans several periods, return the last rather than the first.
+    """
+    value = str(value)
+    year = int(value[0:4])
+    if len(value) == 4:
+        month = 12 if last else 1
+    elif value[4] == "Q":
+        month = 3 * int(value[5]) - (0 if last else 2)
+    else:
+        # ADS uses month 00 if the month is unknown; count it as January
+        month = max(int(value[5:7]), 1)
+    return {"Y": year,
+            "Q": year * 4 + (month - 1) // 3,
+            "M": year * 12 + month - 1}[freq]
 
-            if not ignore:  # Propose to the user
-                statusmsg = '(Reviewing article {} out of {}.)\n\n'.format(
-                                idx+1, len(articles))
-                self.add_interactively(article, statusmsg=statusmsg)
-        log.info('Finished reviewing all articles for {}.'.format(month))
 
+def _period_label(number, freq):
+    """Returns the label of a period numbered by `_period_index`."""
+    if freq == "Y":
+        return number
+    if freq == "Q":
+        return "{}Q{}".format(number // 4, number % 4 + 1)
+    return "{}-{:02d}".format(number // 12, number % 12 + 1)
+
+
+def _citations_per_year(citation_count, date, now=None):
+    """Returns the average number of citations per year since publication.
+
+    Returns `None` if the citation count is unknown or the publication
+    appeared today.
+    """
+    try:
+        dateobj = datetime.datetime.strptime(date, '%Y-%m-00')
+    except ValueError:
+        dateobj = datetime.datetime.strptime(date, '%Y-00-00')
+    publication_age = (now or datetime.datetime.now()) - dateobj
+    try:
+        return citation_count / (publication_age.days / 365)
+    except (TypeError, ZeroDivisionError):
+        return None
+
+
+def _chunks(iterable, size):
+    """Yields successive lists of at most `size` items from `iterable`."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _log_outcomes(outcomes):
+    """Logs a summary of the outcomes returned by the bulk methods."""
+    counts = collections.Counter(outcome for _, outcome in outcomes)
+    for outcome in sorted(counts):
+        log.info("{}: {} publication(s).".format(outcome.capitalize(),
+                                                 counts[outcome]))
+    for bibcode, outcome in outcomes:
+        if outcome not in ("inserted", "deleted", "updated"):
+            log.debug("{}: {}".format(bibcode, outcome))
+
+
+def _fetch_by_bibcode(bibcode, client=None, fields=FIELDS):
+    """Returns the `ads.Article` objects matching a bibcode."""
+    articles = [article for _, article in
+                _fetch_by_bibcodes([bibcode], client, fields)]
+    for article in articles:
+        # Print useful warnings
+        if bibcode != article.bibcode:
+            log.warning("Requested {} but ADS API returned {}".format(bibcode, article.bibcode))
+    return articles
+
+
+def _fetch_by_bibcodes(bibcodes, client=None, fields=FIELDS):
+    """Looks up many bibcodes using a single ADS query.
+
+    Parameters
+    ----------
+    bibcodes : list of str
+        Bibcodes to look up, or other ADS identifiers such as DOIs.
+
+    client : `kpub.fetch.ADSClient`, optional
+        Client used to send the query.
+
+    fields : list of str
+        ADS fields to fetch.
+
+    Returns
+    -------
+    matches : list of (bibcode, `ads.Article`) tuples
+        The articles found, paired with the requested bibcode they match
+        (an article may be found under one of its alternate bibcodes).
+        Requested bibcodes which were not found are logged and omitted.
+    """
+    if client is None:
+        with ADSClient(workers=1) as client:
+            return _fetch_by_bibcodes(bibcodes, client, fields)
+    articles = client.search_all(_identifier_query(bibcodes), fl=fields)
+    return _match_bibcodes(bibcodes, articles)
+
+
+def _identifier_query(bibcodes):
+    """Returns the ADS query matching any of the given bibcodes."""
+    return "identifier:({})".format(" OR ".join('"{}"'.format(bibcode)
+                                                for bibcode in bibcodes))
+
+
+def _match_bibcodes(bibcodes, articles, warn_missing=True):
+    """Pairs the articles returned by `_identifier_query` with the bibcodes."""
+    requested = set(bibcodes)
+    matches, found = [], set()
+    for article in articles:
+        # Read the raw fields, because missing attributes are lazy-loaded
+        identifiers = ([article.bibcode] +
+                       (article._raw.get("alternate_bibcode") or []) +
+                       (article._raw.get("identifier") or []))
+        for bibcode in requested.intersection(identifiers):
+            matches.append((bibcode, article))
+            found.add(bibcode)
+    if warn_missing:
+        for bibcode in requested - found:
+            log.warning("{} was not found in ADS.".format(bibcode))
+    return matches
+
+
+def _update_queries(month, database="astronomy"):
+    """Returns the (source, query) pairs searching ADS for candidates.
+
+    The "ack" query looks for the Kepler funding message in the
+    acknowledgements, the "keyword" query for keywords in the title and
+    abstracts.
+    """
+    ack_query = """(ack:"Kepler mission"
+                                OR ack:"K2 mission"
+                                OR ack:"Kepler team"
+                                OR ack:"K2 team")
+                               -ack:"partial support from"
+                               pubdate:"{}"
+                               database:"{}"
+                            """.format(month, database)
+    keyword_query = """(
+                                abs:"Kepler"
+                                OR abs:"K2"
+                                OR abs:"KIC"
+                                OR abs:"EPIC"
+                                OR abs:"KOI"
+                                OR abs:"8462852"
+                                OR abs:"1145+017"
+                                OR abs:"NGC 6791"
+                                OR abs:"NGC 6819"
+                                OR title:"Kepler"
+                                OR title:"K2"
+                                OR title:"8462852"
+                                OR title:"1145+017"
+                                OR full:"K2-ESPRINT"
+                                OR full:"Kepler photometry"
+                                OR full:"K2 photometry"
+                                OR full:"Kepler lightcurve"
+                                OR full:"K2 lightcurve"
+                                )
+                               pubdate:"{}"
+                               database:"{}"
+                            """.format(month, database)
+    return [("ack", ack_query), ("keyword", keyword_query)]
+
+
+def _log_rule_hits(rules):
+    """Logs how many candidates each rule of a `RuleSet` decided."""
+    for name, count in sorted(rules.hits.items()):
+        log.info("Rule '{}' decided {} candidate(s).".format(name, count))
+
+
+def _review_message(source, number, total, month=None):
+    """Returns the status message shown above a candidate under review."""
+    if source == "ack":
+        message = ("Showing article {} out of {} that mentions Kepler "
+                   "in the acknowledgements".format(number, total))
+    else:
+        message = "(Reviewing article {} out of {}".format(number, total)
+    if month is not None:
+        message += " of {}".format(month)
+    return message + (".\n\n" if source == "ack" else ".)\n\n")
+
+
+def _month_range(spec):
+    """Returns the months of a "YYYY-MM..YYYY-MM" range, or `[spec]`."""
+    if ".." not in spec:
+        return [spec]
+    bounds = spec.split("..")
+    if (len(bounds) != 2 or
+            not all(re.match(r"^\d{4}-\d{2}$", bound) for bound in bounds)):
+        raise ValueError("Invalid range of months '{}', expected "
+                         "YYYY-MM..YYYY-MM.".format(spec))
+    first, last = bounds
+    year, month = int(first[:4]), int(first[5:])
+    months = []
+    while "{:04d}-{:02d}".format(year, month) <= last:
+        months.append("{:04d}-{:02d}".format(year, month))
+        year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+    if not months:
+        raise ValueError("Invalid range of months '{}'.".format(spec))
+    return months
+
+
+def _recent_months(count, now=None):
+    """Returns the current and previous months, most recent first."""
+    now = now or datetime.datetime.now()
+    year, month = now.year, now.month
+    months = []
+    for _ in range(count):
+        months.append("{:04d}-{:02d}".format(year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months
+
+
+def _field_set(fields):
+    """Returns the set of ADS fields stored in the `fields` column."""
+    if fields is None:
+        return set(FIELDS)
+    return set(fields.split(",")) if fields else set()
+
+
+def _fields_value(fields):
+    """Returns the value of the `fields` column for a set of ADS fields."""
+    if fields >= set(FIELDS):
+        return None
+    return ",".join(sorted(fields))
+
+
+def _merge_fields(metadata, stored, raw, fetched):
+    """Merges newly fetched ADS fields into stored metadata.
+
+    Parameters
+    ----------
+    metadata : dict
+        Stored metadata, which is updated in place.
+
+    stored : str
+        Value of the `fields` column of the stored metadata.
+
+    raw : dict
+        Raw ADS metadata of the article.
+
+    fetched : iterable of str
+        The fields which were fetched; ADS omits the empty ones from `raw`.
+
+    Returns
+    -------
+    metadata, fields : dict, str
+        The merged metadata and the new value of the `fields` column.
+    """
+    fetched = set(fetched)
+    for field in fetched:
+        if field in raw:
+            metadata[field] = raw[field]
+        else:
+            metadata.pop(field, None)
+    return metadata, _fields_value(_field_set(stored) | fetched)
+
+
+def _add_profile_argument(parser):
+    """Adds the option selecting the ADS fields to fetch to a parser."""
+    parser.add_argument('--profile', default=DEFAULT_PROFILE,
+                        choices=list(FIELD_PROFILES),
+                        help="ADS fields to fetch (default: {}); missing "
+                             "fields are fetched on first use.".format(
+                                 DEFAULT_PROFILE))
+
+
+def _add_cache_arguments(parser):
+    """Adds the options controlling the ADS response cache to a parser."""
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Do not use the cache of ADS responses.")
+    parser.add_argument('--refresh-cache', action='store_true',
+                        help="Ignore the cached ADS responses, "
+                             "but store the new ones.")
+
+
+def _ads_client(args, ttl=DEFAULT_TTL, **kwargs):
+    """Returns an `ADSClient` using the response cache next to the db file.
+
+    The cache is controlled by the options added by `_add_cache_arguments`,
+    `ttl` is the number of seconds after which cached responses expire.
+    """
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.f + ".ads-cache", ttl=ttl,
+                              refresh=args.refresh_cache)
+    return ADSClient(response_cache=cache, **kwargs)
+
+
+def _derived_columns(metadata):
+    """Returns the values of the typed columns derived from ADS metadata.
+
+    Parameters
+    ----------
+    metadata : dict
+        Raw ADS metadata of an article.
+
+    Returns
+    -------
+    columns : tuple
+        (citation_count, read_count, refereed, doctype, first_author_norm),
+        where `refereed` is 1, 0, or None if the status is unknown.
+    """
+    properties = metadata.get("property") or []
+    if "REFEREED" in properties:
+        refereed = 1
+    elif "NOT REFEREED" in properties:
+        refereed = 0
+    else:
+        refereed = None
+    return (metadata.get("citation_count"),
+            metadata.get("read_count"),
+            refereed,
+            metadata.get("doctype"),
+            metadata.get("first_author_norm"))
+
+
+def _has_fts5(con):
+    """Returns `True` if the SQLite library supports FTS5 tables."""
+    options = [row[0] for row in con.execute("PRAGMA compile_options;")]
+    return "ENABLE_FTS5" in options
+
+
+def _fts_values(metadata):
+    """Returns the text of an article indexed by the full-text search table.
+
+    Parameters
+    ----------
+    metadata : dict
+        Raw ADS metadata of an article.
+
+    Returns
+    -------
+    values : tuple
+        (title, abstract, keyword_norm, author), in the order of the
+        `pubs_fts` columns, where the lists are joined by spaces.
+    """
+    def join(value):
+        if isinstance(value, list):
+            return " ".join(value) or None
+        return value
+    return (join(metadata.get("title")),
+            metadata.get("abstract"),
+            join(metadata.get("keyword_norm")),
+            join(metadata.get("author")))
 
-##################
-# Helper functions
-##################
 
 def display_abstract(article_dict):
     """Prints the title and abstract of an article to the terminal,
@@ -679,7 +2791,8 @@ def kpub(args=None):
                         help='Save the output and plots in the current directory.')
     args = parser.parse_args(args)
 
-    db = PublicationDB(args.f)
+    # Cache the statistics across runs, e.g. repeated site builds
+    db = PublicationDB(args.f, result_cache_file=args.f + ".cache")
 
     if args.save:
         for bymonth in [True, False]:
@@ -710,7 +2823,8 @@ def kpub(args=None):
         templatedir = os.path.join(PACKAGEDIR, 'templates')
         env = jinja2.Environment(loader=jinja2.FileSystemLoader(templatedir))
         template = env.get_template('template-overview.md')
-        markdown = template.render(metrics=db.get_metrics(),
+        markdown = template.render(cube=db.get_metrics_cube(["mission",
+                                                             "science"]),
                                    most_cited=db.get_most_cited(top=20),
                                    most_active_first_authors=db.get_most_active_first_authors(),
                                    now=datetime.datetime.now())
@@ -725,20 +2839,7 @@ def kpub(args=None):
         f.close()
 
     else:
-        if args.exoplanets and not args.astrophysics:
-            science = "exoplanets"
-        elif args.astrophysics and not args.exoplanets:
-            science = "astrophysics"
-        else:
-            science = None
-
-        if args.kepler and not args.k2:
-            mission = "kepler"
-        elif args.k2 and not args.kepler:
-            mission = "k2"
-        else:
-            mission = None
-
+        mission, science = _mission_and_science(args)
         output = db.to_markdown(group_by_month=args.month,
                                 mission=mission,
                                 science=science)
@@ -747,6 +2848,69 @@ def kpub(args=None):
         print(output)
 
 
+def _mission_and_science(args):
+    """Returns the (mission, science) filter selected by command-line flags."""
+    if args.exoplanets and not args.astrophysics:
+        science = "exoplanets"
+    elif args.astrophysics and not args.exoplanets:
+        science = "astrophysics"
+    else:
+        science = None
+
+    if args.kepler and not args.k2:
+        mission = "kepler"
+    elif args.k2 and not args.kepler:
+        mission = "k2"
+    else:
+        mission = None
+    return mission, science
+
+
+def kpub_search(args=None):
+    """Searches the titles, abstracts, keywords and authors in the database."""
+    parser = argparse.ArgumentParser(
+        description="Search the Kepler/K2 publication list by topic. "
+                    "The query uses SQLite's full-text search syntax, "
+                    "e.g. 'asteroseismology AND \"red giants\"'.")
+    parser.add_argument('-f', metavar='dbfile',
+                        type=str, default=DEFAULT_DB,
+                        help="Location of the Kepler/K2 publication list db. "
+                             "Defaults to ~/.kpub.db.")
+    parser.add_argument('-e', '--exoplanets', action='store_true',
+                        help='Only show exoplanet publications.')
+    parser.add_argument('-a', '--astrophysics', action='store_true',
+                        help='Only show astrophysics publications.')
+    parser.add_argument('-k', '--kepler', action='store_true',
+                        help='Only show Kepler publications.')
+    parser.add_argument('-2', '--k2', action='store_true',
+                        help='Only show K2 publications.')
+    parser.add_argument('-n', '--limit', type=int, default=20,
+                        help='Maximum number of results (default: 20).')
+    parser.add_argument('query', nargs='+',
+                        help='Words or phrases to search for.')
+    args = parser.parse_args(args)
+
+    db = PublicationDB(args.f)
+    mission, science = _mission_and_science(args)
+    try:
+        articles = db.search(" ".join(args.query), mission=mission,
+                             science=science, limit=args.limit)
+    except RuntimeError as e:
+        log.error(str(e))
+        return
+    except sql.OperationalError as e:
+        log.error("Invalid search query: {}".format(e))
+        return
+    for idx, art in enumerate(articles):
+        author = art['author'] or []
+        authors = ', '.join(author[0:3])
+        if len(author) > 3:
+            authors += ', et al.'
+        print('{}. {}'.format(idx + 1, art['title'][0]))
+        print('   {} ({}, {})'.format(authors, art['year'], art['mission']))
+        print('   http://adsabs.harvard.edu/abs/{}'.format(art['bibcode']))
+
+
 def kpub_plot(args=None):
     """Creates beautiful plots of the database."""
     parser = argparse.ArgumentParser(
@@ -757,7 +2921,7 @@ def kpub_plot(args=None):
                              "Defaults to ~/.kpub.db.")
     args = parser.parse_args(args)
 
-    PublicationDB(args.f).plot()
+    PublicationDB(args.f, result_cache_file=args.f + ".cache").plot()
 
 
 def kpub_update(args=None):
@@ -769,10 +2933,91 @@ def kpub_update(args=None):
                         help="Location of the Kepler/K2 publication list db. "
                              "Defaults to ~/.kpub.db.")
     parser.add_argument('month', nargs='?', default=None,
-                        help='Month to query, e.g. 2015-06.')
+                        help='Month to query, e.g. 2015-06, or range of '
+                             'months, e.g. 2015-01..2015-06.')
+    parser.add_argument('--no-harvest', action='store_true',
+                        help="Only review the queued candidates, "
+                             "do not query ADS.")
+    parser.add_argument('--skipped', action='store_true',
+                        help="Also review the candidates skipped before.")
+    _add_profile_argument(parser)
+    _add_cache_arguments(parser)
+    args = parser.parse_args(args)
+    if args.month is not None:
+        try:
+            _month_range(args.month)
+        except ValueError as e:
+            parser.error(str(e))
+
+    db = PublicationDB(args.f)
+    if args.no_harvest:
+        db.update(month=args.month, profile=args.profile, harvest=False,
+                  skipped=args.skipped)
+        return
+    with _ads_client(args) as client:
+        db.update(month=args.month, client=client, profile=args.profile,
+                  skipped=args.skipped)
+
+
+def kpub_harvest(args=None):
+    """Periodically queues the candidate publications for review."""
+    parser = argparse.ArgumentParser(
+        description="Query ADS for candidate publications of the current "
+                    "and previous months, and queue them for review by "
+                    "kpub-update. Runs until interrupted, unless --once "
+                    "is given.")
+    parser.add_argument('-f', metavar='dbfile',
+                        type=str, default=DEFAULT_DB,
+                        help="Location of the Kepler/K2 publication list db. "
+                             "Defaults to ~/.kpub.db.")
+    parser.add_argument('month', nargs='*',
+                        help='Months to query, e.g. 2015-06, or ranges of '
+                             'months, e.g. 2015-01..2015-06. Defaults to '
+                             'the current and previous months.')
+    parser.add_argument('--once', action='store_true',
+                        help="Harvest once and exit, e.g. to run from cron.")
+    parser.add_argument('--interval', type=float,
+                        default=DEFAULT_HARVEST_INTERVAL / 3600.,
+                        help="Hours between harvests (default: {:g}).".format(
+                            DEFAULT_HARVEST_INTERVAL / 3600.))
+    _add_profile_argument(parser)
+    _add_cache_arguments(parser)
     args = parser.parse_args(args)
+    try:
+        requested = [month for spec in args.month
+                     for month in _month_range(spec)]
+    except ValueError as e:
+        parser.error(str(e))
 
-    PublicationDB(args.f).update(month=args.month)
+    if ads is None:
+        log.error("This action requires the ADS key to be setup.")
+        return
+
+    db = PublicationDB(args.f)
+    interval = args.interval * 3600
+    while True:
+        months = requested or _recent_months(2)
+        rules = default_rules()
+        try:
+            # Cached responses must not outlive the interval
+            counts = db.harvest(months, profile=args.profile, rules=rules,
+                                client=_ads_client(args, ttl=min(DEFAULT_TTL,
+                                                                 interval)))
+        except ADSError as e:
+            log.error("Harvest failed: {}".format(e))
+        else:
+            log.info("Harvested {}: {} new candidate(s) pending review, "
+                     "{} rejected.".format(", ".join(months),
+                                           counts["pending"],
+                                           counts["rejected"]))
+            _log_rule_hits(rules)
+        pruned = db.prune_queue()
+        if pruned:
+            log.info("Removed {} old decided candidate(s) from the "
+                     "queue.".format(pruned))
+        if args.once:
+            break
+        time.sleep(interval)
 
 
 def kpub_add(args=None):
@@ -785,11 +3030,32 @@ def kpub_add(args=None):
                              "Defaults to ~/.kpub.db.")
     parser.add_argument('bibcode', nargs='+',
                         help='ADS bibcode that identifies the publication.')
+    _add_profile_argument(parser)
+    _add_cache_arguments(parser)
     args = parser.parse_args(args)
 
+    if ads is None:
+        log.error("This action requires the ADS key to be setup.")
+        return
+
     db = PublicationDB(args.f)
-    for bibcode in args.bibcode:
-        db.add_by_bibcode(bibcode, interactive=True)
+    fields = FIELD_PROFILES[args.profile]
+    with _ads_client(args, workers=1) as client:
+        fetched = [_fetch_by_bibcode(bibcode, client, fields)
+                   for bibcode in args.bibcode]
+    articles = []
+    for matches in fetched:
+        for article in matches:
+            if 'NONARTICLE' in (article.property or []):
+                # Note: data products are sometimes tagged as NONARTICLE
+                log.warning("{} is not an article.".format(article.bibcode))
+            if article in db:
+                log.warning("{} is already in the db.".format(article.bibcode))
+                continue
+            classification = db.classify_interactively(article)
+            if classification is not None:
+                articles.append((article,) + classification)
+    _log_outcomes(db.add_many(articles, fields=fields))
 
 
 def kpub_delete(args=None):
@@ -805,16 +3071,17 @@ def kpub_delete(args=None):
     args = parser.parse_args(args)
 
     db = PublicationDB(args.f)
-    for bibcode in args.bibcode:
-        db.delete_by_bibcode(bibcode)
+    _log_outcomes(db.delete_many(args.bibcode))
 
 
 def kpub_import(args=None):
     """Import publications from a csv file.
 
     The csv file must contain entries of the form "bibcode,mission,science".
-    The actual metadata of each publication will be grabbed using the ADS API,
-    hence this routine may take 10-20 minutes to complete.
+    The actual metadata of the publications will be grabbed using the ADS API,
+    looking up `DEFAULT_FETCH_BATCHSIZE` bibcodes per query, with several
+    queries in flight.  Each batch is added in its own transaction, and the
+    bibcodes of the queries which failed are listed at the end.
     """
     parser = argparse.ArgumentParser(
         description="Batch-import papers into the Kepler/K2 publication list "
@@ -827,19 +3094,51 @@ def kpub_import(args=None):
                              "Defaults to ~/.kpub.db.")
     parser.add_argument('csvfile',
                         help="Filename of the csv file to ingest.")
+    _add_profile_argument(parser)
+    _add_cache_arguments(parser)
     args = parser.parse_args(args)
 
+    if ads is None:
+        log.error("This action requires the ADS key to be setup.")
+        return
+
     db = PublicationDB(args.f)
-    import time
-    for line in ProgressBar(open(args.csvfile, 'r').readlines()):
-        for attempt in range(5):
-            try:
-                col = line.split(',')  # Naive csv parsing
-                db.add_by_bibcode(col[0], mission=col[1], science=col[2].strip())
-                time.sleep(0.1)
-                break
-            except Exception as e:
-                print("Warning: attempt #{} for {}: error '{}'".format(attempt, col[0], e))
+
+    # Read the classifications, ignoring repeated bibcodes
+    classifications = collections.OrderedDict()
+    with open(args.csvfile, 'r') as csvfile:
+        for row in csv.reader(csvfile):
+            if not row:
+                continue
+            bibcode, mission, science = [col.strip() for col in row[0:3]]
+            if classifications.setdefault(bibcode, (mission, science)) != (mission, science):
+                log.warning("Ignoring conflicting classification of {}".format(bibcode))
+
+    # The batches are fetched concurrently, but each one is written as soon
+    # as it arrives, so that the database is not locked while waiting for ADS
+    fields = FIELD_PROFILES[args.profile]
+    batches = list(_chunks(list(classifications), DEFAULT_FETCH_BATCHSIZE))
+    queries = [_identifier_query(batch) for batch in batches]
+    outcomes = []
+    with _ads_client(args) as client, ProgressBar(len(batches)) as bar:
+        results = client.search_many(queries, fl=fields, skip_errors=True)
+        for batch, articles in zip(batches, results):
+            if articles is None:
+                outcomes.extend((bibcode, "failed") for bibcode in batch)
+            else:
+                matches = _match_bibcodes(batch, articles)
+                found = set(bibcode for bibcode, _ in matches)
+                outcomes.extend(db.add_many(
+                    [(article,) + classifications[bibcode]
+                     for bibcode, article in matches], fields=fields))
+                outcomes.extend((bibcode, "missing") for bibcode in batch
+                                if bibcode not in found)
+            bar.update()
+    _log_outcomes(outcomes)
+    failed = [bibcode for bibcode, outcome in outcomes if outcome == "failed"]
+    if failed:
+        log.warning("Could not fetch {} bibcode(s), please import them "
+                    "again: {}".format(len(failed), " ".join(failed)))
 
 
 def kpub_export(args=None):
@@ -853,12 +3152,103 @@ def kpub_export(args=None):
     args = parser.parse_args(args)
 
     db = PublicationDB(args.f)
-    cur = db.con.execute("SELECT bibcode, mission, science "
-                         "FROM pubs ORDER BY bibcode;")
-    for row in cur.fetchall():
+    cur = db.reader.execute("SELECT bibcode, mission, science "
+                            "FROM pubs ORDER BY bibcode;")
+    for row in cur:  # streams the rows rather than loading them all
         print('{0},{1},{2}'.format(row[0], row[1], row[2]))
 
 
+def kpub_compact(args=None):
+    """Re-encodes the metadata in the database to reduce the file size."""
+    parser = argparse.ArgumentParser(
+        description="Compress the metadata stored in the Kepler/K2 "
+                    "publication list db to reduce its file size.")
+    parser.add_argument('-f', metavar='dbfile',
+                        type=str, default=DEFAULT_DB,
+                        help="Location of the Kepler/K2 publication list db. "
+                             "Defaults to ~/.kpub.db.")
+    parser.add_argument('-c', '--codec', default='zlib',
+                        choices=sorted(codec.CODECS),
+                        help="Encoding of the metadata (default: zlib).")
+    args = parser.parse_args(args)
+
+    size_before = os.path.getsize(args.f)
+    PublicationDB(args.f).compact(args.codec)
+    log.info("Compacted {} from {:.1f} MB to {:.1f} MB.".format(
+             args.f, size_before / 1e6, os.path.getsize(args.f) / 1e6))
+
+
+def kpub_rebuild_aggregates(args=None):
+    """Recomputes the summary tables behind the publication counts."""
+    parser = argparse.ArgumentParser(
+        description="Recompute the summary tables of the Kepler/K2 "
+                    "publication list db.")
+    parser.add_argument('-f', metavar='dbfile',
+                        type=str, default=DEFAULT_DB,
+                        help="Location of the Kepler/K2 publication list db. "
+                             "Defaults to ~/.kpub.db.")
+    args = parser.parse_args(args)
+    PublicationDB(args.f).rebuild_aggregates()
+    log.info("Rebuilt the summary tables of {}.".format(args.f))
+
+
+def kpub_refresh(args=None):
+    """Updates the metadata of the publications which changed in ADS."""
+    parser = argparse.ArgumentParser(
+        description="Fetch the metadata of the publications which changed "
+                    "in ADS since the last refresh, e.g. to update citation "
+                    "counts and bibcodes.")
+    parser.add_argument('-f', metavar='dbfile',
+                        type=str, default=DEFAULT_DB,
+                        help="Location of the Kepler/K2 publication list db. "
+                             "Defaults to ~/.kpub.db.")
+    parser.add_argument('--full', action='store_true',
+                        help="Fetch all publications, not only those which "
+                             "changed since the last refresh.")
+    _add_profile_argument(parser)
+    _add_cache_arguments(parser)
+    args = parser.parse_args(args)
+
+    if ads is None:
+        log.error("This action requires the ADS key to be setup.")
+        return
+
+    db = PublicationDB(args.f)
+    _log_outcomes(db.refresh(client=_ads_client(args), full=args.full,
+                             profile=args.profile))
+
+
+def kpub_fields(args=None):
+    """Prints the storage used by each field of the stored metadata."""
+    parser = argparse.ArgumentParser(
+        description="Report the number of bytes per row used by each ADS "
+                    "metadata field in the Kepler/K2 publication list db.")
+    parser.add_argument('-f', metavar='dbfile',
+                        type=str, default=DEFAULT_DB,
+                        help="Location of the Kepler/K2 publication list db. "
+                             "Defaults to ~/.kpub.db.")
+    args = parser.parse_args(args)
+
+    db = PublicationDB(args.f)
+    count, stored = db.reader.execute("SELECT COUNT(*), SUM(LENGTH(metrics)) "
+                                      "FROM pubs;").fetchone()
+    if not count:
+        log.error("{} is empty.".format(args.f))
+        return
+    sizes = db.field_sizes()
+    total = sum(nbytes for _, _, nbytes in sizes)
+    print("{:<20} {:>6} {:>10} {:>6}  {}".format("field", "rows", "bytes/row",
+                                                 "share", "profile"))
+    for field, rows, nbytes in sizes:
+        profile = [name for name, fields in FIELD_PROFILES.items()
+                   if field in fields]
+        print("{:<20} {:>6} {:>10.1f} {:>5.1f}%  {}".format(
+              field, rows, nbytes / count, 100. * nbytes / total,
+              profile[0] if profile else "-"))
+    print("Total: {:.1f} bytes/row as JSON, {:.1f} bytes/row as stored "
+          "(codec: {}).".format(total / count, stored / count, db.codec))
+
+
 def kpub_spreadsheet(args=None):
     """Export the publication database to an Excel spreadsheet."""
     try:
@@ -875,8 +3265,16 @@ def kpub_spreadsheet(args=None):
     args = parser.parse_args(args)
 
     db = PublicationDB(args.f)
+    if ads is not None:
+        # The spreadsheet includes fields which may not have been fetched
+        try:
+            _log_outcomes(db.backfill("analytics"))
+        except ADSError as e:
+            log.warning("Could not fetch the missing fields, exporting the "
+                        "stored ones only: {}".format(e))
     spreadsheet = []
-    cur = db.con.execute("SELECT bibcode, year, month, date, mission, science, metrics "
+    cur = db.con.execute("SELECT bibcode, year, month, date, mission, science, "
+                         "kpub_json(metrics, codec) "
                          "FROM pubs WHERE mission != 'unrelated' ORDER BY bibcode;")
     for row in cur.fetchall():
         metrics = json.loads(row[6])
@@ -889,16 +3287,8 @@ def kpub_spreadsheet(args=None):
                 refereed = ''
         except TypeError:  # .property is None
             refereed = ''
-        # Compute citations per year
-        try:
-            dateobj = datetime.datetime.strptime(row[3], '%Y-%m-00')
-        except ValueError:
-            dateobj = datetime.datetime.strptime(row[3], '%Y-00-00')
-        publication_age = datetime.datetime.now() - dateobj
-        try:
-            citations_per_year = metrics['citation_count'] / (publication_age.days / 365)
-        except (TypeError, ZeroDivisionError):
-            citations_per_year = 0
+        citations_per_year = _citations_per_year(metrics['citation_count'],
+                                                 row[3]) or 0
 
         myrow = collections.OrderedDict([
                     ('bibcode', row[0]),
@@ -912,15 +3302,20 @@ def kpub_spreadsheet(args=None):
                     ('read_count', metrics['read_count']),
                     ('first_author_norm', metrics['first_author_norm']),
                     ('title', metrics['title'][0]),
-                    ('keyword_norm', metrics['keyword_norm']),
-                    ('abstract', metrics['abstract']),
+                    ('keyword_norm', metrics.get('keyword_norm')),
+                    ('abstract', metrics.get('abstract')),
                     ('co_author_norm', metrics['author_norm']),
-                    ('affiliations', metrics['aff'])])
+                    ('affiliations', metrics.get('aff'))])
         spreadsheet.append(myrow)
 
     output_fn = 'kepler-publications.xls'
     print('Writing {}'.format(output_fn))
-    pd.DataFrame(spreadsheet).to_excel(output_fn, index=False)
+    with pd.ExcelWriter(output_fn) as writer:
+        pd.DataFrame(spreadsheet).to_excel(writer, sheet_name='publications',
+                                           index=False)
+        # Tidy table of the metrics by year, mission, science, etc.
+        pd.DataFrame(db.get_metrics_cube().rows()).to_excel(
+            writer, sheet_name='metrics', index=False)
 
 
 if __name__ == '__main__':
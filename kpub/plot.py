@@ -81,16 +81,17 @@ def plot_by_year(db,
     colors : list of str
         Define the facecolor for [kepler, k2, extrapolation]
     """
-    # Obtain the dictionary which provides the annual counts
+    # Obtain the arrays which provide the annual counts
     current_year = datetime.datetime.now().year
-    counts = db.get_annual_publication_count(year_begin=first_year, year_end=current_year)
+    years, counts = db.timeseries('Y', by=['mission'],
+                                  start=first_year, end=current_year)
 
     # Now make the actual plot
     fig = pl.figure()
     ax = fig.add_subplot(111)
     if mission != 'k2':
-        pl.bar(np.array(list(counts['kepler'].keys())),
-               list(counts['kepler'].values()),
+        pl.bar(years,
+               counts['kepler'],
                label='Kepler',
                facecolor=colors[0],
                width=barwidth)
@@ -98,9 +99,9 @@ def plot_by_year(db,
         if mission == 'k2':
             bottom = None
         else:
-            bottom = list(counts['kepler'].values())
-        pl.bar(np.array(list(counts['k2'].keys())),
-               list(counts['k2'].values()),
+            bottom = counts['kepler']
+        pl.bar(years,
+               counts['k2'],
                bottom=bottom,
                label='K2-Based Publications',
                facecolor=colors[1],
@@ -110,10 +111,10 @@ def plot_by_year(db,
         now = datetime.datetime.now()
         fraction_of_year_passed = float(now.strftime("%-j")) / 365.2425
         if mission == 'both':
-            current_total = (counts['kepler'][current_year] +
-                             counts['k2'][current_year])
+            current_total = (counts['kepler'][-1] +
+                             counts['k2'][-1])
         else:
-            current_total = counts[mission][current_year]
+            current_total = counts[mission][-1]
         expected = (1/fraction_of_year_passed - 1) * current_total
         pl.bar(current_year,
                expected,
@@ -163,12 +164,8 @@ def plot_science_piechart(db, output_fn="kpub-piechart.pdf", dpi=200):
     dpi : float
         Output resolution.
     """
-    count = []
-    for science in SCIENCES:
-        cur = db.con.execute("SELECT COUNT(*) FROM pubs "
-                             "WHERE science = ?;", [science])
-        rows = list(cur.fetchall())
-        count.append(rows[0][0])
+    science_count = db.get_science_count()
+    count = [science_count[science] for science in SCIENCES]
 
     # Plot the pie chart
     patches, texts, autotexts = pl.pie(count,
@@ -234,9 +231,10 @@ def plot_author_count(db,
     paper_counts = []
     author_counts, first_author_counts = [], []
     k2_count, kepler_count = [], []
-    for year in range(first_year - 1, current_year):
+    for year, metrics in db.iter_cumulative_metrics('Y', start=first_year - 1,
+                                                    end=current_year - 1,
+                                                    earlier=False):
         cumulative_years.append(year)
-        metrics = db.get_metrics(cumulative_years)
         paper_counts.append(metrics['publication_count'])
         author_counts.append(metrics['author_count'])
         first_author_counts.append(metrics['first_author_count'])
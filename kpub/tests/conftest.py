@@ -0,0 +1,108 @@
+"""Fixtures shared by the tests of the PublicationDB class."""
+import re
+
+import pytest
+from ads.search import Article
+
+from kpub.fetch import ADSClient, ADSError
+
+
+def _make_article(idx, year=2015, mission_hint="Kepler", **kwargs):
+    """Returns a fake `ads.Article` carrying the metadata kpub relies on."""
+    authors = ["Author{}, A".format(idx), "Coauthor, B"]
+    raw = {"id": str(idx),
+           "bibcode": "{}ApJ...{:03d}..{:03d}X".format(year, idx, idx),
+           "year": str(year),
+           "pubdate": "{}-03-00".format(year),
+           "title": ["{} paper number {}".format(mission_hint, idx)],
+           "abstract": "We use {} photometry.".format(mission_hint),
+           "keyword_norm": ["planets"],
+           "author": authors,
+           "author_norm": authors,
+           "first_author_norm": authors[0],
+           "property": ["REFEREED", "ARTICLE"],
+           "doctype": "article",
+           "pub": "The Astrophysical Journal",
+           "citation_count": idx,
+           "read_count": float(idx),
+           "alternate_bibcode": None}
+    raw.update(kwargs)
+    return Article(**raw)
+
+
+class FakeADS(object):
+    """Answers the searches of `ADSClient` from lists of fake articles.
+
+    Attributes
+    ----------
+    records : list of `ads.Article`
+        Articles returned by identifier queries, i.e. by imports, refreshes
+        and backfills, if they match one of the quoted identifiers.
+        Queries with an "indexstamp" range only return the articles
+        indexed since its start.
+
+    ack, keyword : list of `ads.Article`, or dict
+        Articles returned by the "ack" and "keyword" queries of `update`,
+        optionally by month.
+
+    unavailable : list of str
+        Identifier queries mentioning one of these bibcodes fail.
+
+    error : str or None
+        If set, every query fails with this message.
+
+    queries, fields : list
+        The queries received, and the fields they requested.
+    """
+    def __init__(self):
+        self.records = []
+        self.ack = []
+        self.keyword = []
+        self.unavailable = []
+        self.error = None
+        self.queries = []
+        self.fields = []
+
+    def search(self, q, fl=("bibcode",), rows=2000, start=0, **kwargs):
+        self.queries.append(q)
+        self.fields.append(fl)
+        if self.error is not None:
+            raise ADSError(self.error)
+        if q.startswith("identifier:"):
+            found = self._identified(q)
+        else:
+            found = self.ack if "ack:" in q else self.keyword
+            if isinstance(found, dict):
+                found = found.get(q.split('pubdate:"')[1][:7], [])
+        return ([Article(**art._raw) for art in found[start:start + rows]],
+                len(found))
+
+    def _identified(self, q):
+        """Returns the records matching an identifier query."""
+        if any('"{}"'.format(bibcode) in q for bibcode in self.unavailable):
+            raise ADSError("Service unavailable")
+        found = [art for art in self.records
+                 if any('"{}"'.format(ident) in q for ident in
+                        [art.bibcode] + (art._raw.get("alternate_bibcode") or []))]
+        since = re.search(r'indexstamp:\["([^"]+)"', q)
+        if since is not None:
+            found = [art for art in found
+                     if art._raw.get("indexstamp", "") >= since.group(1)]
+        return found
+
+
+@pytest.fixture
+def make_article():
+    """Factory of fake `ads.Article` objects, numbered by `idx`."""
+    return _make_article
+
+
+@pytest.fixture
+def fake_ads(monkeypatch):
+    """Replaces the ADS search API by a `FakeADS`."""
+    ads = FakeADS()
+
+    def search(client, q, *args, **kwargs):
+        return ads.search(q, *args, **kwargs)
+    monkeypatch.setattr(ADSClient, "search", search)
+    return ads
@@ -0,0 +1,55 @@
+"""Test the fields fetched from a fake ADS search API on first access."""
+import json
+
+from ads.search import Article
+
+import kpub
+
+
+def test_field_profiles(tmpdir, make_article, fake_ads):
+    """Are the fields missing from a profile fetched on first access?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    full = make_article(1, indexstamp="2019-01-01T00:00:00Z")
+    minimal = dict((key, value) for key, value in full._raw.items()
+                   if key in kpub.FIELD_PROFILES["minimal"])
+    db.add(Article(**minimal), fields=kpub.FIELD_PROFILES["minimal"])
+    db.add(make_article(2))
+    fake_ads.records = [full]
+
+    pubs = dict((pub.bibcode, pub) for pub in db.get_all())
+    pub = pubs[full.bibcode]
+    assert pub["abstract"] == full.abstract
+    assert pub.keyword_norm == ["planets"]
+    assert len(fake_ads.fields) == 1 and "keyword_norm" in fake_ads.fields[0]
+    assert "aff" not in fake_ads.fields[0]
+    # The fields were stored, and are not fetched again
+    assert db.get_metadata(full.bibcode)["abstract"] == full.abstract
+    assert db.get_all()[-1]["abstract"] == full.abstract
+    assert db.search("photometry")
+    assert pubs[make_article(2).bibcode].get("aff") is None
+    assert len(fake_ads.fields) == 1
+    assert pub.get("aff") is None
+    assert len(fake_ads.fields) == 2
+
+    sizes = dict((field, (rows, nbytes)) for field, rows, nbytes
+                 in db.field_sizes())
+    assert sizes["title"] == (2, 2 * len(json.dumps(full.title)))
+
+
+def test_backfill_on_access(tmpdir, make_article, fake_ads):
+    """Are the fields of all the rows fetched at once, and only tried once?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    articles = [make_article(idx, aff=["Somewhere"]) for idx in range(3)]
+    db.add_many([Article(**dict((key, value) for key, value in art._raw.items()
+                                if key in kpub.FIELD_PROFILES["site"]))
+                 for art in articles], fields=kpub.FIELD_PROFILES["site"])
+    fake_ads.records = articles
+    db.get_most_cited()
+    cited = db.get_most_cited()  # copied from the result cache
+    assert cited[0]["aff"] == ["Somewhere"]
+    assert [pub["aff"] for pub in db.get_all()] == [["Somewhere"]] * 3
+    assert len(fake_ads.queries) == 1
+
+    fake_ads.error = "offline"
+    assert [pub.get("reference") for pub in db.get_all()] == [None] * 3
+    assert len(fake_ads.queries) == 2
@@ -0,0 +1,384 @@
+"""Test the PublicationDB class against a small, temporary database."""
+import json
+import sys
+import sqlite3 as sql
+
+import pytest
+
+import kpub
+
+
+def test_typed_columns(tmpdir, make_article):
+    """Are the typed columns populated and used by the analytic methods?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1, citation_count=None, read_count=None), mission="kepler")
+    db.add(make_article(2, property=["NOT REFEREED"]), mission="k2")
+    db.add(make_article(3), mission="k2", science="astrophysics")
+    metrics = db.get_metrics()
+    assert metrics["publication_count"] == 3
+    assert metrics["refereed_count"] == 2
+    assert metrics["k2_citation_count"] == 5
+    assert metrics["author_count"] == 4
+    assert metrics["first_author_count"] == 3
+    assert [art["bibcode"] for art in db.get_most_cited(top=2)] == \
+        [make_article(3).bibcode, make_article(2).bibcode]
+    # Rows without a read count must not break the ranking
+    assert db.get_most_read(top=3)[-1]["read_count"] is None
+
+
+def test_migration(tmpdir, make_article):
+    """Are the typed columns backfilled when opening a legacy database?"""
+    filename = str(tmpdir.join("legacy.db"))
+    con = sql.connect(filename)
+    con.execute("CREATE TABLE pubs(id UNIQUE, bibcode UNIQUE, year, month, "
+                "date, mission, science, metrics)")
+    article = make_article(7)
+    con.execute("INSERT INTO pubs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [article.id, article.bibcode, article.year, "2015-03",
+                 article.pubdate, "kepler", "exoplanets",
+                 json.dumps(article._raw)])
+    con.commit()
+    con.close()
+
+    db = kpub.PublicationDB(filename)
+    version = db.con.execute("PRAGMA user_version;").fetchone()[0]
+    assert version == kpub.SCHEMA_VERSION
+    row = db.con.execute("SELECT citation_count, refereed, first_author_norm "
+                         "FROM pubs;").fetchone()
+    assert row == (7, 1, "Author7, A")
+    columns = db.con.execute("PRAGMA table_info(pubs);").fetchall()
+    assert [column[1] for column in columns if column[5]] == ["rowid"]
+
+
+def test_vacuum(tmpdir, make_article):
+    """Do the indexes survive a VACUUM by another client?"""
+    filename = str(tmpdir.join("test.db"))
+    db = kpub.PublicationDB(filename)
+    db.add_many([make_article(1), make_article(2), make_article(3)])
+    db.delete_by_bibcode(make_article(1).bibcode)
+    con = sql.connect(filename)
+    con.execute("VACUUM;")
+    con.close()
+    assert [pub.bibcode for pub in
+            db.get_publications_by_author("Author3, A")] == \
+        [make_article(3).bibcode]
+    assert len(db.search("Author2")) == 1
+
+
+def test_authors(tmpdir, make_article):
+    """Is the author index kept in sync by add and delete_by_bibcode?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1), mission="kepler")
+    db.add(make_article(2), mission="k2")
+    assert len(db.get_publications_by_author("Coauthor, B")) == 2
+    assert len(db.get_publications_by_author("Coauthor, B", first_author=True)) == 0
+    assert len(db.get_publications_by_author("Coauthor, B", mission="k2")) == 1
+    names, counts = db.get_all_authors(top=1)
+    assert names[0] == "Coauthor, B" and counts[0] == 2
+    db.delete_by_bibcode(make_article(1).bibcode)
+    assert db.get_metrics()["author_count"] == 2
+    assert db.get_publications_by_author("Author1, A") == []
+
+
+def test_bulk_methods(tmpdir, make_article):
+    """Do the bulk methods report an outcome for every item?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    articles = [make_article(idx) for idx in range(5)]
+    outcomes = db.add_many(articles + [make_article(0)], chunksize=2)
+    assert [outcome for _, outcome in outcomes] == ["inserted"] * 5 + ["duplicate"]
+    outcomes = db.reclassify_many([(articles[0].bibcode, "k2", "astrophysics"),
+                                   ("missing", "k2", "astrophysics")])
+    assert outcomes == [(articles[0].bibcode, "updated"), ("missing", "missing")]
+    assert db.get_metadata(articles[0].bibcode)["mission"] == "k2"
+    assert db.get_metrics()["k2_count"] == 1
+    outcomes = db.delete_many([articles[1].bibcode, articles[1].bibcode])
+    assert outcomes == [(articles[1].bibcode, "deleted"),
+                        (articles[1].bibcode, "missing")]
+    assert db.get_metrics()["publication_count"] == 4
+
+
+def test_contains(tmpdir, make_article):
+    """Does the membership index follow renames and all the writers?"""
+    filename = str(tmpdir.join("test.db"))
+    db = kpub.PublicationDB(filename)
+    preprint = make_article(1, bibcode="2015arXiv150100001A")
+    assert preprint not in db
+    db.add(preprint)
+    assert preprint in db
+    # The journal version of the preprint has a new id and bibcode
+    journal = make_article(2, identifier=["2015arXiv150100001A",
+                                          "arXiv:1501.00001"])
+    assert journal in db
+    db.delete_many([preprint.bibcode])
+    assert journal not in db
+    db.add(make_article(3, alternate_bibcode=["2015arXiv150100003A"]))
+    assert make_article(4, bibcode="2015arXiv150100003A") in db
+    # Changes made by another connection are picked up
+    other = kpub.PublicationDB(filename)
+    other.add(make_article(5))
+    assert make_article(5) in db
+    other.delete_many([make_article(3).bibcode])
+    assert make_article(4, bibcode="2015arXiv150100003A") not in db
+
+
+def test_wal(tmpdir, make_article):
+    """Can readers query a WAL database while a write is in progress?"""
+    import threading
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")), wal=True)
+    db.add(make_article(1))
+    counts = []
+
+    def read():
+        counts.append(db.reader.execute("SELECT COUNT(*) FROM pubs;").fetchone()[0])
+
+    with db.connections.transaction():
+        db.con.execute("DELETE FROM pubs;")
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+    assert counts == [1]  # the reader sees the last committed snapshot
+    assert db.reader is not db.con
+    db.close()
+
+
+def test_search(tmpdir, make_article):
+    """Does the full-text index follow inserts, updates and deletes?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1, mission_hint="Kepler"), mission="kepler")
+    db.add(make_article(2, mission_hint="K2"), mission="k2")
+    db.add(make_article(3, abstract="Asteroseismology of red giants."),
+           mission="kepler", science="astrophysics")
+    assert [art["bibcode"] for art in db.search('"red giants"')] == \
+        [make_article(3).bibcode]
+    assert len(db.search("photometry")) == 2
+    assert len(db.search("photometry", mission="k2")) == 1
+    assert len(db.search("Coauthor", science="astrophysics")) == 1
+    db.reclassify_many([(make_article(1).bibcode, "k2", "exoplanets")])
+    assert len(db.search("photometry", mission="k2")) == 2
+    db.delete_by_bibcode(make_article(2).bibcode)
+    assert len(db.search("photometry")) == 1
+
+
+def test_external_writers(tmpdir, make_article):
+    """Can clients without the kpub SQL functions write to the pubs table?"""
+    filename = str(tmpdir.join("test.db"))
+    db = kpub.PublicationDB(filename)
+    db.add(make_article(1), mission="kepler")
+    con = sql.connect(filename)
+    con.execute("UPDATE pubs SET mission = 'k2';")
+    con.execute("INSERT INTO pubs (id, bibcode, mission, metrics) "
+                "VALUES (?, ?, ?, ?);", ["2", "2015ext", "kepler",
+                                         json.dumps({"title": ["Seismology"]})])
+    con.commit()
+    con.close()
+    assert len(db.search("photometry", mission="k2")) == 1
+    db.reindex()
+    assert len(db.search("seismology")) == 1
+    # The index is contentless, the text is only stored in the pubs table
+    assert db.con.execute("SELECT title FROM pubs_fts;").fetchall() == \
+        [(None,), (None,)]
+
+
+def test_without_fts5(tmpdir, monkeypatch, make_article):
+    """Does the database work, except for search, without FTS5 support?"""
+    monkeypatch.setattr(sys.modules["kpub.kpub"], "_has_fts5", lambda con: False)
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1), mission="kepler")
+    db.delete_by_bibcode(make_article(1).bibcode)
+    db.reindex()
+    with pytest.raises(RuntimeError):
+        db.search("photometry")
+
+
+def test_compact(tmpdir, make_article):
+    """Are rows readable after re-encoding, including newly added ones?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1), mission="kepler")
+    db.compact("zlib")
+    db.add(make_article(2), mission="k2")
+    codecs = db.con.execute("SELECT DISTINCT codec FROM pubs;").fetchall()
+    assert codecs == [("zlib",)]
+    assert db.get_metadata(make_article(1).bibcode)["title"] == \
+        make_article(1).title
+    assert len(db.get_all()) == 2
+    assert len(db.search("photometry")) == 2
+    assert len(db.get_publications_by_author("Coauthor, B")) == 2
+
+
+def test_publication(tmpdir, make_article):
+    """Do Publication objects decode lazily and act like dictionaries?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1), mission="kepler")
+    pub = db.get_all()[0]
+    assert pub["bibcode"] == pub.bibcode == make_article(1).bibcode
+    assert pub["citation_count"] == 1
+    assert pub._metadata is None  # the columns did not require decoding
+    assert pub.title == pub["title"] == make_article(1).title
+    assert "{bibcode} {mission}".format(**pub) == pub.bibcode + " kepler"
+    assert dict(pub)["science"] == "exoplanets"
+    # The columns take precedence over the metadata, also once decoded
+    with db.connections.transaction():
+        db.con.execute("UPDATE pubs SET mission = 'k2';")
+    pub = db.get_all()[0]
+    assert pub.title and pub["mission"] == pub.mission == "k2"
+    assert dict(pub)["mission"] == "k2"
+
+
+def test_iterators(tmpdir, make_article):
+    """Do the streaming iterators page through and resume correctly?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add_many(make_article(idx, year=2010 + idx % 3) for idx in range(10))
+    bibcodes = [pub.bibcode for pub in db.iter_all(batchsize=3)]
+    # Publications of the same date are listed in the same order everywhere
+    assert [pub["bibcode"] for pub in db.get_all()] == bibcodes
+    assert [row[3] for row in db.query()] == bibcodes
+    assert [pub.bibcode for pub in
+            db.get_publications_by_author("Coauthor, B")] == bibcodes
+    rows = list(db.query_iter(batchsize=4))
+    assert [row[3] for row in rows] == bibcodes
+    # Resume after the fifth publication
+    pubs = list(db.iter_all(batchsize=3))
+    resumed = db.iter_all(batchsize=3, after=(pubs[4].pubdate, pubs[4].bibcode))
+    assert [pub.bibcode for pub in resumed] == bibcodes[5:]
+
+
+def test_aggregates(tmpdir, make_article):
+    """Do the triggers keep the summary counts in sync with the pubs table?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add_many([make_article(1, year=2010), make_article(2, year=2010),
+                 make_article(3, year=2015)], mission="kepler")
+    db.add(make_article(4, year=2015), mission="k2", science="astrophysics")
+    counts = db.get_annual_publication_count(2010, 2015)
+    assert counts["kepler"][2010] == 2 and counts["both"][2015] == 2
+    db.reclassify_many([(make_article(1, year=2010).bibcode, "k2", "exoplanets")])
+    db.delete_by_bibcode(make_article(4, year=2015).bibcode)
+    cumulative = db.get_annual_publication_count_cumulative(2012, 2015)
+    assert cumulative["kepler"] == {2012: 1, 2013: 1, 2014: 1, 2015: 2}
+    assert cumulative["k2"][2015] == 1
+    assert db.get_science_count() == {"exoplanets": 3, "astrophysics": 0}
+    expected = db.con.execute("SELECT * FROM pub_counts ORDER BY 1, 2, 3, 4, 5;").fetchall()
+    db.rebuild_aggregates()
+    assert db.con.execute("SELECT * FROM pub_counts ORDER BY 1, 2, 3, 4, 5;").fetchall() == expected
+
+
+def test_timeseries(tmpdir, make_article):
+    """Are the time series dense, cumulative and aligned as requested?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1, year=2009, pubdate="2009-05-00"), mission="kepler")
+    db.add(make_article(2, year=2010, pubdate="2010-11-00"), mission="kepler")
+    db.add(make_article(3, year=2014, pubdate="2014-02-00"), mission="k2",
+           science="astrophysics")
+    years, counts = db.timeseries("Y")
+    assert list(years) == list(range(2009, 2015))
+    assert list(counts["kepler"]) == [1, 1, 0, 0, 0, 0]
+    quarters, counts = db.timeseries("Q", by=[], start="2009Q2", end=2009)
+    assert list(quarters) == ["2009Q2", "2009Q3", "2009Q4"]
+    assert list(counts) == [1, 0, 0]
+    offsets, counts = db.timeseries("Q", align="mission_start", cumulative=True, end=7)
+    assert list(offsets) == list(range(8))
+    assert list(counts["kepler"]) == [0, 1, 1, 1, 1, 1, 1, 2]
+    assert list(counts["k2"]) == [1] * 8
+    months, counts = db.timeseries("M", by=["science", "refereed"], start="2014-01", end="2014-02")
+    assert list(counts[("astrophysics", 1)]) == [0, 1]
+
+
+def test_unknown_month(tmpdir, make_article):
+    """Are publications with month 00 counted in January of their year?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1, year=2015, pubdate="2015-00-00"), mission="kepler")
+    months, counts = db.timeseries("M", start="2014-11", end="2015-02")
+    assert list(months) == ["2014-11", "2014-12", "2015-01", "2015-02"]
+    assert list(counts["kepler"]) == [0, 0, 1, 0]
+    quarters, counts = db.timeseries("Q", start="2014Q4", end="2015Q1")
+    assert list(counts["kepler"]) == [0, 1]
+    cumulative = db.iter_cumulative_metrics("Q", start="2014Q4", end="2015Q1")
+    assert [(quarter, metrics["kepler_count"])
+            for quarter, metrics in cumulative] == [("2014Q4", 0), ("2015Q1", 1)]
+    cumulative = db.iter_cumulative_metrics("M", start="2014-12", end="2015-01")
+    assert [metrics["kepler_count"] for _, metrics in cumulative] == [0, 1]
+
+
+def test_cumulative_metrics(tmpdir, make_article):
+    """Do the cumulative metrics agree with get_metrics for growing year lists?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add_many([make_article(idx, year=2010 + idx % 4) for idx in range(8)],
+                mission="kepler")
+    db.add(make_article(9, year=2012, author_norm=["Author1, A"]), mission="k2")
+    years = []
+    for year, metrics in db.iter_cumulative_metrics("Y", end=2014):
+        years.append(year)
+        expected = db.get_metrics(years)
+        assert metrics == {key: expected[key] for key in metrics}
+    assert years == [2010, 2011, 2012, 2013, 2014]
+    years = []
+    for year, metrics in db.iter_cumulative_metrics("Y", start=2012, end=2014,
+                                                    earlier=False):
+        years.append(year)
+        expected = db.get_metrics(years)
+        assert metrics == {key: expected[key] for key in metrics}
+    assert years == [2012, 2013, 2014]
+
+
+def test_metrics_cube(tmpdir, make_article):
+    """Are the cube's roll-ups consistent with the individual cells?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1, year=2012), mission="kepler")
+    db.add(make_article(2, year=2015, property=["NOT REFEREED"]), mission="k2")
+    db.add(make_article(3, year=2015), mission="k2", science="astrophysics")
+    cube = db.get_metrics_cube(["year", "mission", "refereed"])
+    assert cube.values("year") == [2012, 2015]
+    assert cube.get()["publication_count"] == 3
+    assert cube.get(year=2015)["citation_count"] == 5
+    assert cube.get(year=2015, mission="k2", refereed=0)["publication_count"] == 1
+    assert cube.get(mission="k2")["author_count"] == 3
+    assert cube.get(mission="k2")["first_author_count"] == 2
+    assert cube.get(year=2009)["publication_count"] == 0
+    rows = cube.rows()
+    assert len(rows) == 1 + 2 + 2 + 2 + 2 + 3 + 3 + 3  # all roll-ups
+    assert rows[0]["year"] == kpub.MetricsCube.ALL
+
+
+def test_result_cache(tmpdir, make_article):
+    """Are cached results reused until the database changes?"""
+    cache_file = str(tmpdir.join("test.db.cache"))
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")), result_cache_file=cache_file)
+    db.add(make_article(1), mission="kepler")
+    metrics = db.get_metrics()
+    metrics["publication_count"] = 99  # callers get private copies
+    assert db.get_metrics()["publication_count"] == 1
+    assert db.result_cache.hits >= 1
+    db.add(make_article(2), mission="k2")
+    assert db.get_metrics()["publication_count"] == 2
+    # Another process reuses the results stored on disk
+    other = kpub.PublicationDB(str(tmpdir.join("test.db")), result_cache_file=cache_file)
+    assert [pub.bibcode for pub in other.get_most_cited()] == \
+        [pub.bibcode for pub in db.get_most_cited()]
+    assert other.get_metrics()["publication_count"] == 2
+    assert other.result_cache.misses == 1 and other.result_cache.hits == 1
+    # Repairs of the derived tables invalidate the cached results too
+    with db.connections.transaction():
+        db.con.execute("DELETE FROM pub_counts;")
+    version = db.version
+    db.rebuild_aggregates()
+    assert db.version != version
+    version = db.version
+    db.reindex()
+    assert db.version != version
+
+
+def test_ranking(tmpdir, make_article):
+    """Do top_k and h_index rank by indexed and derived metrics?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    assert db.top_k("citations_per_year", 3) == []
+    db.add_many([make_article(idx, year=2000 + idx, citation_count=10 * idx)
+                 for idx in range(1, 6)], mission="kepler")
+    db.add(make_article(6, citation_count=None, read_count=None), mission="k2")
+    ranking = db.top_k("citation_count", 2)
+    assert [value for _, value in ranking] == [50, 40]
+    ranking = db.top_k("citations_per_year", 6)
+    values = [value for _, value in ranking]
+    assert values[:-1] == sorted(values[:-1], reverse=True)
+    assert ranking[-1][0].bibcode == make_article(6).bibcode and values[-1] is None
+    assert db.get_most_read(top=6)[-1]["read_count"] is None
+    assert db.h_index() == 5
+    assert db.h_index(mission="k2") == 0
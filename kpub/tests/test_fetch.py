@@ -0,0 +1,145 @@
+"""Test the ADS client against a local fake ADS server."""
+import json
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+import pytest
+
+from kpub.cache import ResponseCache
+from kpub.fetch import ADSClient, ADSError, TokenBucket
+
+
+class FakeADS(ThreadingMixIn, HTTPServer):
+    """Serves `ndocs` fake documents for every query."""
+    daemon_threads = True
+
+    def __init__(self, ndocs=5, failures=0):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), FakeADSHandler)
+        self.ndocs = ndocs
+        self.failures = failures  # number of requests answered with HTTP 503
+        self.requests = []
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}/v1".format(self.server_address[1])
+
+
+class FakeADSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        self.server.requests.append(params)
+        if self.server.failures > 0:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        start, rows = int(params["start"][0]), int(params["rows"][0])
+        docs = [{"bibcode": "{}-{}".format(params["q"][0], idx)}
+                for idx in range(start, min(start + rows, self.server.ndocs))]
+        body = json.dumps({"response": {"numFound": self.server.ndocs,
+                                        "docs": docs}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-RateLimit-Remaining", "4000")
+        self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FakeADS()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_search_many(server):
+    """Are all the pages of several queries fetched, in order?"""
+    server.ndocs = 5
+    with ADSClient(token="x", api_url=server.url, rate=100) as client:
+        results = list(client.search_many(["a", "b"], rows=2))
+        assert [[art.bibcode for art in articles] for articles in results] == \
+            [["a-{}".format(idx) for idx in range(5)],
+             ["b-{}".format(idx) for idx in range(5)]]
+        assert len(server.requests) == 6
+        assert client.limiter.remaining is not None
+
+
+def test_retries(server):
+    """Are server errors retried, and do persistent errors raise?"""
+    server.failures = 2
+    with ADSClient(token="x", api_url=server.url, backoff=0.01) as client:
+        assert len(client.search_all("a")) == 5
+        server.failures = 10
+        with pytest.raises(ADSError):
+            client.search_all("a")
+        assert list(client.search_many(["b"], skip_errors=True)) == [None]
+
+
+def test_token_bucket():
+    """Does the token bucket throttle bursts and an exhausted quota?"""
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.time()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.time() - start >= 0.15
+    bucket.update({"X-RateLimit-Remaining": "0",
+                   "X-RateLimit-Reset": str(time.time() + 3600)})
+    with pytest.raises(ADSError):
+        bucket.acquire()
+
+
+def test_response_cache(server, tmpdir):
+    """Are responses reused until they expire or the cache is refreshed?"""
+    filename = str(tmpdir.join("ads-cache"))
+
+    def search(**kwargs):
+        cache = ResponseCache(filename, **kwargs)
+        with ADSClient(token="x", api_url=server.url,
+                       response_cache=cache) as client:
+            return [art.bibcode for art in client.search_all("a")]
+
+    expected = ["a-{}".format(idx) for idx in range(5)]
+    assert search() == expected
+    assert search() == expected
+    assert len(server.requests) == 1
+    assert search(refresh=True) == expected
+    assert len(server.requests) == 2
+    assert search(ttl=0) == expected
+    assert len(server.requests) == 3
+    # Responses beyond the size cap are evicted
+    search(max_bytes=1)
+    cache = ResponseCache(filename)
+    assert cache._con.execute("SELECT COUNT(*) FROM responses;").fetchone()[0] == 0
+    cache.close()
+
+
+def test_iter_search(server):
+    """Are pages fetched lazily, one page ahead of the consumer?"""
+    server.ndocs = 7
+    with ADSClient(token="x", api_url=server.url, rate=100) as client:
+        results = client.iter_search("a", rows=2)
+        stream = iter(results)
+        assert next(stream).bibcode == "a-0"
+        assert results.num_found == 7
+        time.sleep(0.1)
+        assert len(server.requests) == 2
+        assert [art.bibcode for art in stream] == \
+            ["a-{}".format(idx) for idx in range(1, 7)]
+        assert len(server.requests) == 4
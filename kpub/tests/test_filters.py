@@ -0,0 +1,59 @@
+"""Test the rules triaging the candidates found by update()."""
+import pytest
+
+from ads.search import Article
+
+from kpub.filters import Rule, RuleSet, default_rules
+
+
+def make_candidate(abstract="We use Kepler photometry.",
+                   bibcode="2015ApJ...1..1X", **kwargs):
+    raw = {"bibcode": bibcode, "abstract": abstract,
+           "property": ["REFEREED"], "pub": "The Astrophysical Journal"}
+    raw.update(kwargs)
+    return Article(**raw)
+
+
+def test_default_rules():
+    """Do the default rules reject the same candidates as before?"""
+    rules = default_rules()
+    candidates = [make_candidate(),
+                  make_candidate(abstract=None),
+                  make_candidate(abstract="On Johannes KEPLER's work."),
+                  make_candidate(property=["NOT REFEREED"]),
+                  make_candidate(property=["NOT REFEREED"], pub="arXiv e-prints"),
+                  make_candidate(property=["NOT REFEREED"], pub=None),
+                  make_candidate(bibcode="2015hst..prop.1234X"),
+                  make_candidate(bibcode="2014cosp...40..123X")]
+    names = [None if rule is None else rule.name
+             for rule in rules.apply(candidates)]
+    assert names == [None, "no abstract", "johannes", "not refereed", None,
+                     None, "proposal", "cospar abstract"]
+    assert rules.hits == {"no abstract": 1, "johannes": 1, "not refereed": 1,
+                          "proposal": 1, "cospar abstract": 1}
+
+
+def test_phrases():
+    """Are overlapping phrases found, and do include rules take precedence?"""
+    rules = RuleSet([Rule("include", "kepler mission"),
+                     Rule("exclude", "kepler's third law"),
+                     Rule("exclude", "third law of kepler mission"),
+                     Rule("exclude", "mission")])
+    rejections = rules.apply([
+        make_candidate(abstract="Kepler's third law"),
+        make_candidate(abstract="the third law of Kepler mission"),
+        make_candidate(abstract="a mission"),
+        make_candidate(abstract="kepler's"),
+        make_candidate(abstract="law")])
+    assert [rule and rule.pattern for rule in rejections] == \
+        ["kepler's third law", None, "mission", None, None]
+    assert rules.hits["kepler mission"] == 1
+    # Phrases do not match across the abstracts of a batch
+    assert RuleSet([Rule("exclude", "ab")]).apply(
+        [make_candidate(abstract="a"), make_candidate(abstract="b")]) == \
+        [None, None]
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        Rule("reject", "kepler")
@@ -0,0 +1,44 @@
+"""Test kpub-import against a fake ADS search API."""
+import sys
+
+import kpub
+
+
+def test_import(tmpdir, make_article, fake_ads):
+    """Does kpub-import look up bibcodes in batches and map them back?"""
+    articles = [make_article(idx) for idx in range(3)]
+    articles[2] = make_article(2, alternate_bibcode=["2015arXiv0002"])
+    fake_ads.records = articles
+
+    csvfile = tmpdir.join("import.csv")
+    csvfile.write("{},kepler,exoplanets\n"
+                  "{},k2,astrophysics\n"
+                  "{},kepler,exoplanets\n"
+                  "2015arXiv0002,k2,exoplanets\n"
+                  "missing,k2,exoplanets\n".format(articles[0].bibcode,
+                                                   articles[1].bibcode,
+                                                   articles[0].bibcode))
+    dbfile = str(tmpdir.join("test.db"))
+    kpub.kpub_import(["-f", dbfile, str(csvfile)])
+    assert len(fake_ads.queries) == 1
+    db = kpub.PublicationDB(dbfile)
+    assert db.get_metrics()["publication_count"] == 3
+    assert db.get_metadata(articles[2].bibcode)["mission"] == "k2"
+
+
+def test_import_errors(tmpdir, monkeypatch, caplog, make_article, fake_ads):
+    """Are the batches which fail to download reported, and the rest added?"""
+    articles = [make_article(idx) for idx in range(4)]
+    fake_ads.records = articles
+    fake_ads.unavailable = [articles[3].bibcode]
+    monkeypatch.setattr(sys.modules["kpub.kpub"], "DEFAULT_FETCH_BATCHSIZE", 2)
+
+    csvfile = tmpdir.join("import.csv")
+    csvfile.write("".join("{},kepler,exoplanets\n".format(art.bibcode)
+                          for art in articles))
+    dbfile = str(tmpdir.join("test.db"))
+    kpub.kpub_import(["-f", dbfile, "--no-cache", str(csvfile)])
+    db = kpub.PublicationDB(dbfile)
+    assert db.get_metrics()["publication_count"] == 2
+    assert "{} {}".format(articles[2].bibcode, articles[3].bibcode) in \
+        caplog.text
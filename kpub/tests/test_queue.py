@@ -0,0 +1,65 @@
+"""Test the queue of candidates harvested for review."""
+import sys
+import sqlite3 as sql
+
+import kpub
+from kpub.fetch import ADSClient
+
+
+def test_review_queue(tmpdir, monkeypatch, make_article, fake_ads):
+    """Are harvested candidates queued, and is the review resumable?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    fake_ads.ack = [make_article(1)]
+    fake_ads.keyword = [make_article(2), make_article(3, abstract="Johannes Kepler"),
+                        make_article(4)]
+    counts = db.harvest(["2015-03"], client=ADSClient(token="x"))
+    assert counts == {"pending": 3, "rejected": 1}
+
+    answers = [("kepler", "exoplanets"), None]  # skip the second candidate
+    reviewed = []
+
+    def classify_interactively(article, statusmsg=""):
+        reviewed.append(article.bibcode)
+        if not answers:
+            raise KeyboardInterrupt
+        return answers.pop(0)
+    monkeypatch.setattr(db, "classify_interactively", classify_interactively)
+    monkeypatch.setattr(sys.modules["kpub.kpub"], "input", lambda: "y")
+    try:
+        db.update(month="2015-03")
+    except KeyboardInterrupt:
+        pass
+    assert reviewed == [make_article(idx).bibcode for idx in (1, 2, 4)]
+    statuses = dict(db.con.execute("SELECT bibcode, status FROM candidates;"))
+    assert [statuses[make_article(idx).bibcode] for idx in range(1, 5)] == \
+        ["accepted", "skipped", "rejected", "pending"]
+
+    # Resuming does not query ADS again, and only shows the pending candidate
+    answers[:] = [("k2", "astrophysics")]
+    db.update(month="2015-03")
+    assert len(fake_ads.queries) == 2
+    assert reviewed[3:] == [make_article(4).bibcode]
+    answers[:] = [("unrelated", "")]
+    db.update(month="2015-03", skipped=True)
+    assert reviewed[4:] == [make_article(2).bibcode]
+    assert db.con.execute("SELECT status FROM candidates WHERE bibcode = ?;",
+                          [make_article(2).bibcode]).fetchone()[0] == "rejected"
+    assert db.get_metrics()["publication_count"] == 2
+
+
+def test_queue_file(tmpdir, make_article, fake_ads):
+    """Is the queue kept out of the database, and can it be pruned?"""
+    filename = str(tmpdir.join("test.db"))
+    db = kpub.PublicationDB(filename)
+    db.get_all()
+    assert not tmpdir.join("test.db.queue").exists()
+
+    fake_ads.keyword = [make_article(1), make_article(2, abstract="Johannes Kepler")]
+    db.harvest(["2015-04"], client=ADSClient(token="x"))
+    assert not db._has_table("candidates")
+    assert db._harvested("2015-04") is not None
+    assert sql.connect(filename + ".queue").execute(
+        "SELECT COUNT(*) FROM candidates WHERE metrics IS NULL;"
+    ).fetchone()[0] == 1
+    assert db.prune_queue(days=1) == 0
+    assert db.prune_queue(days=-1) == 1  # the candidate rejected by the rules
@@ -0,0 +1,35 @@
+"""Test PublicationDB.refresh against a fake ADS search API."""
+import kpub
+from kpub.fetch import ADSClient
+
+
+def test_refresh(tmpdir, make_article, fake_ads):
+    """Does refresh update the changed records in place, after a watermark?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(1, bibcode="2015arXiv0001"), mission="k2",
+           science="astrophysics")
+    db.add(make_article(2, indexstamp="2019-01-01T00:00:00Z"))
+    db.add(make_article(3, indexstamp="2019-01-01T00:00:00Z"))
+    fake_ads.records = [make_article(1, citation_count=50, read_count=None,
+                                     alternate_bibcode=["2015arXiv0001"],
+                                     author=["Newauthor, N"],
+                                     author_norm=["Newauthor, N"],
+                                     indexstamp="2019-02-01T00:00:00Z"),
+                        make_article(2, indexstamp="2019-01-01T00:00:00Z")]
+
+    outcomes = dict(db.refresh(client=ADSClient(token="x")))
+    assert outcomes == {"2015arXiv0001": "updated",
+                        make_article(2).bibcode: "updated",
+                        make_article(3).bibcode: "missing"}
+    assert "indexstamp" not in fake_ads.queries[-1]
+    pub = db.get_metadata(make_article(1).bibcode)
+    assert (pub["citation_count"], pub["mission"]) == (50, "k2")
+    assert db.top_k("citation_count", k=1)[0][1] == 50
+    assert "Newauthor, N" in db.get_all_authors()[0].tolist()
+    assert db.search("Newauthor")[0]["bibcode"] == make_article(1).bibcode
+    assert db.get_metrics()["publication_count"] == 3
+
+    # The next refresh only asks for records indexed after the watermark
+    outcomes = dict(db.refresh(client=ADSClient(token="x")))
+    assert '"2019-02-01T00:00:00Z" TO *' in fake_ads.queries[-1]
+    assert outcomes[make_article(2).bibcode] == "unchanged"
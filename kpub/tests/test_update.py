@@ -0,0 +1,48 @@
+"""Test the review of the candidates found by PublicationDB.update."""
+import sys
+
+import kpub
+from kpub.fetch import ADSClient
+
+
+def test_update(tmpdir, monkeypatch, make_article, fake_ads):
+    """Are the candidates of both update queries reviewed once, in order?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    db.add(make_article(4))
+    fake_ads.ack = [make_article(1), make_article(2)]
+    fake_ads.keyword = [make_article(2), make_article(3), make_article(4)]
+    reviewed = []
+
+    def classify_interactively(article, statusmsg=""):
+        reviewed.append(article.bibcode)
+        return "k2", "exoplanets"
+    monkeypatch.setattr(db, "classify_interactively", classify_interactively)
+    monkeypatch.setattr(sys.modules["kpub.kpub"], "input", lambda: "y")
+
+    db.update(month="2015-03", client=ADSClient(token="x"))
+    assert reviewed == [make_article(idx).bibcode for idx in (1, 2, 3)]
+    assert db.get_metrics()["k2_count"] == 3
+
+
+def test_update_months(tmpdir, monkeypatch, make_article, fake_ads):
+    """Are the queries of a range of months merged into one review?"""
+    db = kpub.PublicationDB(str(tmpdir.join("test.db")))
+    preprint = make_article(1, bibcode="2015arXiv151200001A")
+    journal = make_article(2, identifier=["2015arXiv151200001A"])
+    fake_ads.keyword = {"2015-12": [preprint, make_article(3)],
+                        "2016-01": [make_article(3), journal, make_article(4)]}
+    reviewed = []
+
+    def classify_interactively(article, statusmsg=""):
+        # All the months are queried before the first review
+        assert len(fake_ads.queries) == 4
+        reviewed.append(article.bibcode)
+        return None
+    monkeypatch.setattr(db, "classify_interactively", classify_interactively)
+    monkeypatch.setattr(sys.modules["kpub.kpub"], "input", lambda: "y")
+
+    db.update(month="2015-12..2016-01", client=ADSClient(token="x"))
+    assert reviewed == [preprint.bibcode, make_article(3).bibcode,
+                        make_article(4).bibcode]
+    assert sys.modules["kpub.kpub"]._month_range("2015-11..2016-02") == \
+        ["2015-11", "2015-12", "2016-01", "2016-02"]
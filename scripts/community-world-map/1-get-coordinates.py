@@ -13,6 +13,8 @@ OUTPUT_FN = 'coordinates.csv'
 # Step 1: obtain the first author affiliations from kpub
 locations = []
 db = kpub.PublicationDB()
+# Fetch the affiliations of all the publications at once, if needed
+db.backfill("analytics")
 all_publications = db.get_all()
 for publication in all_publications:
     affiliations = publication['aff']
@@ -37,6 +37,8 @@ out.write("bibcode,year,pubdate,citation_count,mission,science,lon,lat,country_s
 
 # Obtain the first author affiliations from kpub
 db = kpub.PublicationDB()
+# Fetch the affiliations of all the publications at once, if needed
+db.backfill("analytics")
 all_publications = db.get_all()
 for publication in tqdm(all_publications):
     affiliations = publication['aff']
@@ -51,16 +51,6 @@ MISSIONS = ['kepler', 'k2']
 SCIENCES = ['exoplanets', 'astrophysics']
 
 
-def quarterly_count(db, mission="k2", start="2015-01", stop="2015-04"):
-    cur = db.con.execute("""SELECT COUNT(*) FROM pubs 
-                            WHERE mission = ? 
-                            AND month >= ?
-                            AND month < ?;""",
-                            [mission, start, stop])
-    rows = list(cur.fetchall())
-    return rows[0][0]
-
-
 if __name__ == "__main__":
     barwidth = 0.75
     output_fn = "kpub-first-quarters.pdf"
@@ -71,21 +61,12 @@ if __name__ == "__main__":
     db = kpub.PublicationDB()
 
     # First collect the data
+    quarters, counts = db.timeseries('Q', by=['mission'],
+                                     align='mission_start', end=7)
     k1_labels = ["2009/1", "2009/2", "2009/3", "2009/4", "2010/1", "2010/2", "2010/3", "2010/4"]
-    k1_start =  ["2009-01", "2009-04", "2009-07", "2009-10", "2010-01", "2010-04", "2010-07", "2010-10"]
-    k1_stop =   ["2009-04", "2009-07", "2009-10", "2010-01", "2010-04", "2010-07", "2010-10", "2011-01"]
-    k1_counts = []
-    for idx, label in enumerate(k1_labels):
-        count = quarterly_count(db, mission="kepler", start=k1_start[idx], stop=k1_stop[idx])
-        k1_counts.append(count)
-
+    k1_counts = counts['kepler']
     k2_labels = ["2014/1", "2014/2", "2014/3", "2014/4", "2015/1", "2015/2", "2015/3", "2015/4"]
-    k2_start =  ["2014-01", "2014-04", "2014-07", "2014-10", "2015-01", "2015-04", "2015-07", "2015-10"]
-    k2_stop =   ["2014-04", "2014-07", "2014-10", "2015-01", "2015-04", "2015-07", "2015-10", "2016-01"]
-    k2_counts = []
-    for idx, label in enumerate(k2_labels):
-        count = quarterly_count(db, mission="k2", start=k2_start[idx], stop=k2_stop[idx])
-        k2_counts.append(count)
+    k2_counts = counts['k2']
 
     # Now make the actual plot
     fig = plt.figure()
@@ -51,16 +51,6 @@ MISSIONS = ['kepler', 'k2']
 SCIENCES = ['exoplanets', 'astrophysics']
 
 
-def pubcount(db, mission="k2", start="2015-01", stop="2015-04"):
-    cur = db.con.execute("""SELECT COUNT(*) FROM pubs 
-                            WHERE mission = ? 
-                            AND month >= ?
-                            AND month < ?;""",
-                            [mission, start, stop])
-    rows = list(cur.fetchall())
-    return rows[0][0]
-
-
 if __name__ == "__main__":
     barwidth = 0.75
     dpi = 200
@@ -70,23 +60,18 @@ if __name__ == "__main__":
     db = kpub.PublicationDB()
 
     # First collect the data
+    years, counts = db.timeseries('Y', by=['mission'],
+                                  align='mission_start', end=5)
     k1_years = [2009, 2010, 2011, 2012, 2013, 2014]
-    k1_start = ["{}-01".format(yr) for yr in k1_years]
-    k1_stop = ["{}-01".format(yr+1) for yr in k1_years]
-    k1_counts = []
-    for idx, label in enumerate(k1_years):
-        count = pubcount(db, mission="kepler", start=k1_start[idx], stop=k1_stop[idx])
-        k1_counts.append(count)
+    k1_counts = counts['kepler']
 
     k2_years = [2014, 2015, 2016, 2017, 2018, 2019]
-    k2_start = ["{}-01".format(yr) for yr in k2_years]
-    k2_stop = ["{}-01".format(yr+1) for yr in k2_years]
-    k2_stop[1] = "2050-01"
-    k2_start[2] = "2050-01"
-    k2_counts = []
-    for idx, label in enumerate(k2_years):
-        count = pubcount(db, mission="k2", start=k2_start[idx], stop=k2_stop[idx])
-        k2_counts.append(count)
+    # The second K2 bar shows all the publications from 2015 onwards
+    years, totals = db.timeseries('Y', by=['mission'],
+                                  align='mission_start', cumulative=True)
+    k2_counts = np.zeros(len(k2_years), dtype=int)
+    k2_counts[0] = counts['k2'][0]
+    k2_counts[1] = totals['k2'][-1] - totals['k2'][0]
 
     # Now make the actual plot
     fig = plt.figure()
@@ -14,11 +14,17 @@ except (IOError, ImportError):
 entry_points = {'console_scripts': [
     'kpub = kpub:kpub',
     'kpub-update = kpub:kpub_update',
+    'kpub-harvest = kpub:kpub_harvest',
     'kpub-add = kpub:kpub_add',
     'kpub-delete = kpub:kpub_delete',
     'kpub-import = kpub:kpub_import',
+    'kpub-refresh = kpub:kpub_refresh',
     'kpub-export = kpub:kpub_export',
+    'kpub-compact = kpub:kpub_compact',
+    'kpub-fields = kpub:kpub_fields',
+    'kpub-rebuild-aggregates = kpub:kpub_rebuild_aggregates',
     'kpub-plot = kpub:kpub_plot',
+    'kpub-search = kpub:kpub_search',
     'kpub-spreadsheet = kpub:kpub_spreadsheet'
 ]}
 
@@ -36,7 +42,8 @@ setup(name='kpub',
       install_requires=["jinja2",
                         "six",
                         "astropy",
-                        "ads"],
+                        "ads",
+                        "requests"],
       entry_points=entry_points,
       classifiers=[
           "Development Status :: 5 - Production/Stable",